@@ -4,64 +4,218 @@ Hugging Face pipeline wrapper for summarization and generation.
 This wrapper attempts to initialize HF pipelines lazily. If model loading fails
 (e.g., no model downloaded), a simple fallback strategy is used.
 """
-from transformers import pipeline
+from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 import logging
+import os
+import re
+import sqlite3
+import threading
+
+from app.cache import default_cache, make_key
 
 LOGGER = logging.getLogger(__name__)
 
 MODEL_NAME = "sshleifer/distilbart-cnn-12-6"  # CPU-friendly summarization/generation model
+DEFAULT_BATCH_SIZE = 8
+WARMUP_TEXT = "The client wants a quick onboarding call and weekly status updates."
+
+# "torch": fp32 PyTorch (default); "int8": dynamically quantized Linear layers;
+# "onnx": ONNX Runtime export produced by `python download_model.py --onnx`.
+BACKENDS = ("torch", "int8", "onnx")
+BACKEND_ENV_VAR = "ONBOARDING_AI_BACKEND"
+ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+# Process-wide registry: every LocalAI (and both tasks) share one tokenizer+model per checkpoint.
+_MODELS = {}
+_PIPELINES = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def onnx_model_dir(model_name=MODEL_NAME):
+    """Where download_model.py writes (and LocalAI reads) the ONNX export of model_name."""
+    return os.path.join(ONNX_DIR, model_name.replace("/", "--") + "-onnx")
+
+
+def _load_backend_model(model_name, backend):
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM  # optional dependency
+        path = onnx_model_dir(model_name)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No ONNX export at {path}; run `python download_model.py --onnx` first.")
+        return AutoTokenizer.from_pretrained(path), ORTModelForSeq2SeqLM.from_pretrained(path)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    if backend == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model
+
+
+def load_model(model_name=MODEL_NAME, backend="torch"):
+    """Return the shared (tokenizer, model) for model_name/backend, loading it on first use."""
+    key = (model_name, backend)
+    with _REGISTRY_LOCK:
+        if key not in _MODELS:
+            _MODELS[key] = _load_backend_model(model_name, backend)
+        return _MODELS[key]
+
+
+def get_pipeline(task, model_name=MODEL_NAME, device=-1, backend="torch"):
+    """Return a shared HF pipeline for task, built on the registry's model weights."""
+    key = (task, model_name, device, backend)
+    if key not in _PIPELINES:
+        tokenizer, model = load_model(model_name, backend)
+        # ONNX Runtime models run on CPU and are not moved by the pipeline.
+        kwargs = {} if backend == "onnx" else {"device": device}
+        with _REGISTRY_LOCK:
+            if key not in _PIPELINES:
+                _PIPELINES[key] = pipeline(task, model=model, tokenizer=tokenizer, **kwargs)
+    return _PIPELINES[key]
+
+
+def _length_buckets(texts, batch_size):
+    """Group indices of texts into batches of similar length to minimise padding."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def _fallback_summary(text):
+    # Fallback: return first 2 sentences or first 200 chars
+    sents = re.split(r'(?<=[.!?])\s+', text.strip())
+    if len(sents) >= 2:
+        return ' '.join(sents[:2])
+    return text.strip()[:200]
+
+
+def _fallback_generation(prompt):
+    # Fallback generation: simple template expansion
+    return prompt + "\n\n[Note: model not available — this is a fallback placeholder.]"
+
 
 class LocalAI:
-    def __init__(self, model_name=MODEL_NAME, device=-1):
+    def __init__(self, model_name=MODEL_NAME, device=-1, cache=None, backend=None):
+        """cache: a ResultCache, None for the process default, or False to disable caching.
+        backend: one of BACKENDS; defaults to $ONBOARDING_AI_BACKEND or "torch"."""
+        backend = backend or os.getenv(BACKEND_ENV_VAR, "torch")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
         self.model_name = model_name
         self.device = device
+        self.backend = backend
+        # Quantized/ONNX outputs can differ slightly, so they get their own cache entries.
+        self._cache_id = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self.cache = default_cache() if cache is None else (cache or None)
         self._summarizer = None
         self._generator = None
+        self._load_failed = False  # don't retry a failed load on every call
 
     def _init_summarizer(self):
-        if self._summarizer is None:
+        if self._summarizer is None and not self._load_failed:
             try:
-                self._summarizer = pipeline("summarization", model=self.model_name, device=self.device)
+                self._summarizer = get_pipeline("summarization", self.model_name, self.device, self.backend)
             except Exception as e:
                 LOGGER.warning("Failed to load summarization pipeline: %s", e)
                 self._summarizer = None
+                self._load_failed = True
 
     def _init_generator(self):
-        if self._generator is None:
+        if self._generator is None and not self._load_failed:
             try:
-                self._generator = pipeline("text2text-generation", model=self.model_name, device=self.device)
+                self._generator = get_pipeline("text2text-generation", self.model_name, self.device, self.backend)
             except Exception as e:
                 LOGGER.warning("Failed to load generation pipeline: %s", e)
                 self._generator = None
+                self._load_failed = True
+
+    def warmup(self):
+        """Load the shared model and run one dummy forward pass; returns False if no model is available."""
+        self._init_summarizer()
+        self._init_generator()
+        if not self._summarizer:
+            return False
+        try:
+            self._summarizer(WARMUP_TEXT, max_length=16, min_length=4, truncation=True)
+        except Exception as e:
+            LOGGER.warning("Warm-up forward pass failed: %s", e)
+            return False
+        return True
 
     def summarize(self, text, max_length=120, min_length=30):
         """Summarize text using HF pipeline or fallback rule-based summary."""
+        return self.summarize_batch([text], max_length=max_length, min_length=min_length)[0]
+
+    def generate(self, prompt, max_length=150):
+        """Generate text (e.g., onboarding steps or email draft)."""
+        return self.generate_batch([prompt], max_length=max_length)[0]
+
+    def summarize_batch(self, texts, max_length=120, min_length=30, batch_size=DEFAULT_BATCH_SIZE):
+        """Summarize a list of texts, sending length-bucketed batches through the pipeline."""
+        texts = list(texts)
+        params = {"max_length": max_length, "min_length": min_length}
+        results = self._cached("summarization", texts, params,
+                               lambda todo: self._run_summarizer(todo, params, batch_size))
+        return [r if r is not None else _fallback_summary(t) for r, t in zip(results, texts)]
+
+    def generate_batch(self, prompts, max_length=150, batch_size=DEFAULT_BATCH_SIZE):
+        """Generate text for a list of prompts, sending length-bucketed batches through the pipeline."""
+        prompts = list(prompts)
+        params = {"max_length": max_length, "do_sample": False}
+        results = self._cached("text2text-generation", prompts, params,
+                               lambda todo: self._run_generator(todo, params, batch_size))
+        return [r if r is not None else _fallback_generation(p) for r, p in zip(results, prompts)]
+
+    def _cached(self, task, inputs, params, run):
+        """Serve inputs from the cache and run the model once per distinct miss.
+
+        Returns one output per input, None where the model was unavailable.
+        Fallback outputs are never cached, so they are recomputed once a model loads.
+        """
+        keys = [make_key(self._cache_id, task, params, x) for x in inputs]
+        found = {}
+        if self.cache:
+            try:
+                found = self.cache.get_many(keys)
+            except sqlite3.OperationalError as e:
+                # e.g. "database is locked" while other workers write: compute instead
+                LOGGER.warning("Result cache read failed, computing: %s", e)
+        todo = list(dict.fromkeys(x for x, k in zip(inputs, keys) if k not in found))
+        computed = {}
+        if todo:
+            computed = {x: r for x, r in zip(todo, run(todo)) if r is not None}
+            if self.cache and computed:
+                try:
+                    self.cache.set_many({make_key(self._cache_id, task, params, x): r for x, r in computed.items()})
+                except sqlite3.OperationalError as e:
+                    LOGGER.warning("Result cache write failed, results not cached: %s", e)
+        return [found[k] if k in found else computed.get(x) for x, k in zip(inputs, keys)]
+
+    def _run_summarizer(self, texts, params, batch_size):
+        results = [None] * len(texts)
         self._init_summarizer()
         if self._summarizer:
             try:
-                out = self._summarizer(text, max_length=max_length, min_length=min_length, truncation=True)
-                return out[0]["summary_text"].strip()
+                for idxs in _length_buckets(texts, batch_size):
+                    out = self._summarizer([texts[i] for i in idxs], truncation=True,
+                                           batch_size=len(idxs), **params)
+                    for i, o in zip(idxs, out):
+                        results[i] = o["summary_text"].strip()
             except Exception as e:
                 LOGGER.warning("Summarizer runtime error: %s", e)
+        return results
 
-        # Fallback: return first 2 sentences or first 200 chars
-        import re
-        sents = re.split(r'(?<=[.!?])\s+', text.strip())
-        if len(sents) >= 2:
-            return ' '.join(sents[:2])
-        return text.strip()[:200]
-
-    def generate(self, prompt, max_length=150):
-        """Generate text (e.g., onboarding steps or email draft)."""
+    def _run_generator(self, prompts, params, batch_size):
+        results = [None] * len(prompts)
         self._init_generator()
         if self._generator:
             try:
-                out = self._generator(prompt, max_length=max_length, do_sample=False)
-                # generated_text for text2text-generation, sometimes 'summary_text' for summarizers
-                key = "generated_text" if "generated_text" in out[0] else list(out[0].values())[0]
-                return out[0].get("generated_text", key).strip()
+                for idxs in _length_buckets(prompts, batch_size):
+                    out = self._generator([prompts[i] for i in idxs], batch_size=len(idxs), **params)
+                    for i, o in zip(idxs, out):
+                        # generated_text for text2text-generation, sometimes 'summary_text' for summarizers
+                        text = o.get("generated_text", list(o.values())[0])
+                        results[i] = text.strip()
             except Exception as e:
                 LOGGER.warning("Generator runtime error: %s", e)
-
-        # Fallback generation: simple template expansion
-        return prompt + "\n\n[Note: model not available — this is a fallback placeholder.]"
+        return results
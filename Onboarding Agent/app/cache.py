@@ -0,0 +1,137 @@
+"""
+cache.py
+Disk-backed, content-addressed cache for LocalAI outputs.
+Entries are keyed by a hash of model name, task, generation params and input
+text, stored in SQLite and evicted least-recently-used first once the cache
+grows past its entry or byte limit.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_ENV_VAR = "ONBOARDING_AI_CACHE"  # path to the cache file, or "off" to disable
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "onboarding_assistant", "localai.sqlite")
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_BUSY_TIMEOUT = 30  # seconds to wait on another process's write lock
+
+_DEFAULT_CACHE = None
+_DEFAULT_CACHE_PID = None
+
+
+def make_key(model_name, task, params, text):
+    """Stable content hash for one model call."""
+    payload = json.dumps({"model": model_name, "task": task, "params": params, "text": text},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Streamlit serves reruns from different threads, so share one guarded connection.
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        if path != ":memory:":
+            # app.run worker processes share the file: WAL lets readers proceed during a write.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys present; refreshes their LRU position."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(f"SELECT key, value FROM entries WHERE key IN ({marks})", part)
+                found.update(rows.fetchall())
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                           [(now, k) for k in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [(k, v, len(v.encode("utf-8")), now) for k, v in items.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def _evict(self):
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        excess_rows = max(count - self.max_entries, 0)
+        excess_bytes = max(size - self.max_bytes, 0)
+        victims = []
+        freed = 0
+        for key, entry_size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            if len(victims) >= excess_rows and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += entry_size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        LOGGER.debug("Evicted %d cache entries (%d bytes)", len(victims), freed)
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": count,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+        self.hits = self.misses = 0
+
+
+def default_cache():
+    """Process-wide cache configured by ONBOARDING_AI_CACHE; None when disabled or unusable."""
+    global _DEFAULT_CACHE, _DEFAULT_CACHE_PID
+    # A forked worker must not reuse its parent's SQLite connection.
+    if _DEFAULT_CACHE_PID != os.getpid():
+        _DEFAULT_CACHE_PID = os.getpid()
+        path = os.getenv(CACHE_ENV_VAR, DEFAULT_CACHE_PATH)
+        _DEFAULT_CACHE = None
+        if path.lower() not in ("", "0", "off", "false", "none"):
+            try:
+                _DEFAULT_CACHE = ResultCache(path)
+            except (OSError, sqlite3.Error) as e:
+                LOGGER.warning("Result cache disabled, could not open %s: %s", path, e)
+    return _DEFAULT_CACHE
@@ -3,54 +3,133 @@ core.py
 CSV loader, validation, summarizer + onboarding plan and email generator.
 """
 import pandas as pd
-from typing import List
-from app.ai_local import LocalAI
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.ai_local import LocalAI, DEFAULT_BATCH_SIZE
 
 REQUIRED_COLUMNS = {'name', 'company', 'services_requested', 'notes'}
+REQUIRED_VALUES = ('name', 'company')  # per-row fields that must not be blank
+DEFAULT_CHUNKSIZE = 1000
+
+DEFAULT_PLAN = [
+    '1. Kickoff meeting to align goals and timelines.',
+    '2. Set up access and required assets.',
+    '3. Deliver first milestone and gather feedback.'
+]
 
 class ValidationError(Exception):
     pass
 
-def load_and_validate_csv(path_or_buffer) -> pd.DataFrame:
-    df = pd.read_csv(path_or_buffer)
-    missing = REQUIRED_COLUMNS - set(df.columns.str.lower())
+def _check_columns(columns) -> List[str]:
+    normalized = [str(c).lower() for c in columns]
+    missing = REQUIRED_COLUMNS - set(normalized)
     if missing:
         raise ValidationError(f"Missing required columns: {', '.join(sorted(missing))}")
+    return normalized
+
+def load_and_validate_csv(path_or_buffer) -> pd.DataFrame:
+    df = pd.read_csv(path_or_buffer)
     # normalize column names to lowercase
-    df.columns = [c.lower() for c in df.columns]
+    df.columns = _check_columns(df.columns)
     return df
 
+def iter_validated_csv(path_or_buffer, chunksize: int = DEFAULT_CHUNKSIZE,
+                       errors: Optional[List[Tuple[int, str]]] = None) -> Iterator[pd.DataFrame]:
+    """Stream a client CSV as validated DataFrame batches of at most `chunksize` rows.
+
+    The header is checked on the first chunk, so a bad file fails before any row is
+    processed. All values are read as strings (blanks as ''). Rows with a blank
+    required value are left out of the batches and, if `errors` is a list, recorded
+    there as (row_index, message). Batches keep the row index of the whole file.
+    """
+    with pd.read_csv(path_or_buffer, chunksize=chunksize, dtype=str, keep_default_na=False) as reader:
+        for chunk in reader:
+            chunk.columns = _check_columns(chunk.columns)
+            blank = pd.Series(False, index=chunk.index)
+            for col in REQUIRED_VALUES:
+                missing = chunk[col].str.strip() == ''
+                if errors is not None:
+                    errors.extend((int(i), f"missing {col}") for i in chunk.index[missing])
+                blank |= missing
+            if blank.any():
+                chunk = chunk[~blank]
+            if len(chunk):
+                yield chunk
+
+def _is_blank(value) -> bool:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return True
+    return str(value).strip() == ''
+
+def _plan_prompt(summary: str) -> str:
+    return ("Create a concise 3-step onboarding plan for a new client based on the following summary.\n\n" 
+            f"Summary: {summary}\n\nSteps:")
+
+def _email_prompt(name: str, company: str, summary: str) -> str:
+    return (f"Write a short, friendly welcome email to {name} at {company}.\n\n"
+            f"Include a one-sentence summary of their needs: {summary}\n\n"
+            "Email:")
+
+def _parse_plan(raw: str) -> List[str]:
+    lines = [l.strip('-•* \t') for l in raw.splitlines() if l.strip()]
+    steps = []
+    for l in lines:
+        if len(steps) >= 3:
+            break
+        if l.lower().startswith('summary:'):
+            continue
+        steps.append(l)
+    return steps or list(DEFAULT_PLAN)
+
 class OnboardingAssistant:
-    def __init__(self, ai=None):
+    def __init__(self, ai=None, batch_size=DEFAULT_BATCH_SIZE):
         self.ai = ai or LocalAI()
+        self.batch_size = batch_size
+
+    def warmup(self) -> bool:
+        """Load the model ahead of the first request, if the backing AI supports it."""
+        warmup = getattr(self.ai, 'warmup', None)
+        return bool(warmup and warmup())
 
     def summarize_client(self, notes: str) -> str:
-        if not notes or str(notes).strip() == '':
+        if _is_blank(notes):
             return "No notes provided."
         return self.ai.summarize(str(notes))
 
     def generate_onboarding_plan(self, summary: str) -> List[str]:
-        prompt = ("Create a concise 3-step onboarding plan for a new client based on the following summary.\n\n" 
-                  f"Summary: {summary}\n\nSteps:")
-        raw = self.ai.generate(prompt)
-        lines = [l.strip('-•* \t') for l in raw.splitlines() if l.strip()]
-        steps = []
-        for l in lines:
-            if len(steps) >= 3:
-                break
-            if l.lower().startswith('summary:'):
-                continue
-            steps.append(l)
-        if not steps:
-            steps = [
-                '1. Kickoff meeting to align goals and timelines.',
-                '2. Set up access and required assets.',
-                '3. Deliver first milestone and gather feedback.'
-            ]
-        return steps
+        raw = self.ai.generate(_plan_prompt(summary))
+        return _parse_plan(raw)
 
     def generate_welcome_email(self, name: str, company: str, summary: str) -> str:
-        prompt = (f"Write a short, friendly welcome email to {name} at {company}.\n\n"
-                  f"Include a one-sentence summary of their needs: {summary}\n\n"
-                  "Email:")
-        return self.ai.generate(prompt)
+        return self.ai.generate(_email_prompt(name, company, summary))
+
+    def process_batch(self, records: Iterable[Dict]) -> List[Dict]:
+        """Summarize and draft plan + email for many clients with one batched call per stage."""
+        records = list(records)
+        names = ['' if _is_blank(r.get('name')) else str(r.get('name')) for r in records]
+        companies = ['' if _is_blank(r.get('company')) else str(r.get('company')) for r in records]
+
+        summaries = ["No notes provided."] * len(records)
+        todo = [i for i, r in enumerate(records) if not _is_blank(r.get('notes'))]
+        if todo:
+            notes = [str(records[i]['notes']) for i in todo]
+            for i, summary in zip(todo, self.ai.summarize_batch(notes, batch_size=self.batch_size)):
+                summaries[i] = summary
+
+        plans = self.ai.generate_batch([_plan_prompt(s) for s in summaries], batch_size=self.batch_size)
+        emails = self.ai.generate_batch(
+            [_email_prompt(n, c, s) for n, c, s in zip(names, companies, summaries)],
+            batch_size=self.batch_size)
+
+        return [
+            {'name': n, 'company': c, 'summary': s, 'plan': _parse_plan(p), 'email': e}
+            for n, c, s, p, e in zip(names, companies, summaries, plans, emails)
+        ]
+
+    def process_dataframe(self, df: pd.DataFrame, chunk_size: int = 256) -> pd.DataFrame:
+        """Run process_batch over a validated DataFrame, chunk_size rows at a time."""
+        results = []
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            results.extend(self.process_batch(chunk.to_dict('records')))
+        return pd.DataFrame(results, index=df.index,
+                            columns=['name', 'company', 'summary', 'plan', 'email'])
@@ -0,0 +1,182 @@
+"""
+run.py
+Headless onboarding runner. Streams a client CSV, shards it across a process
+pool (one OnboardingAssistant per worker) and writes one result per client to
+JSONL or Parquet as shards complete.
+Run with: python -m app.run data/example_clients.csv -o out.jsonl --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.ai_local import DEFAULT_BATCH_SIZE
+from app.core import OnboardingAssistant, ValidationError, iter_validated_csv
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 64
+
+_ASSISTANT = None  # one per worker process, built by _init_worker
+
+
+def _init_worker(batch_size, threads):
+    global _ASSISTANT
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _ASSISTANT = OnboardingAssistant(batch_size=batch_size)
+    _ASSISTANT.warmup()
+
+
+def _process_shard(rows):
+    return process_rows(_ASSISTANT, rows)
+
+
+def process_rows(assistant, rows):
+    """rows: list of (row_index, record). Returns result dicts tagged with their row index."""
+    outputs = assistant.process_batch([record for _, record in rows])
+    return [dict(out, row=i) for (i, _), out in zip(rows, outputs)]
+
+
+def completed_rows(path):
+    """Row indices already present in a JSONL output (a torn last line is ignored)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["row"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+class JsonlWriter:
+    def __init__(self, path, append=False):
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+        if append:
+            self._f.seek(0, os.SEEK_END)
+            if self._f.tell():
+                # Start on a fresh line in case the previous run died mid-write.
+                self._f.write("\n")
+
+    def write(self, results):
+        for r in results:
+            self._f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._schema = pa.schema([
+            ("row", pa.int64()), ("name", pa.string()), ("company", pa.string()),
+            ("summary", pa.string()), ("plan", pa.list_(pa.string())), ("email", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, results):
+        if results:
+            self._writer.write_table(self._pa.Table.from_pylist(results, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def _iter_shards(input_path, shard_size, skip, errors):
+    for batch in iter_validated_csv(input_path, chunksize=shard_size, errors=errors):
+        rows = [(int(i), record) for i, record in zip(batch.index, batch.to_dict("records"))
+                if int(i) not in skip]
+        if rows:
+            yield rows
+
+
+def run(input_path, output_path, workers=1, shard_size=DEFAULT_SHARD_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+        resume=False, assistant=None, errors=None):
+    """Process input_path into output_path and return the number of rows written.
+
+    With workers <= 1 everything runs in this process (using `assistant` if given).
+    With resume=True rows already in a JSONL output are skipped and new rows appended.
+    """
+    parquet = output_path.endswith(".parquet")
+    if resume and parquet:
+        raise ValueError("--resume is only supported for JSONL output")
+    skip = completed_rows(output_path) if resume else set()
+    if skip:
+        LOGGER.info("Resuming: %d rows already in %s", len(skip), output_path)
+
+    shards = _iter_shards(input_path, shard_size, skip, errors)
+    writer = ParquetWriter(output_path) if parquet else JsonlWriter(output_path, append=resume)
+    written = 0
+    try:
+        if workers <= 1:
+            assistant = assistant or OnboardingAssistant(batch_size=batch_size)
+            for rows in shards:
+                results = process_rows(assistant, rows)
+                writer.write(results)
+                written += len(results)
+            return written
+
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(batch_size, threads)) as pool:
+            # Keep a bounded number of shards in flight so memory stays flat on huge files.
+            pending = set()
+            for rows in shards:
+                pending.add(pool.submit(_process_shard, rows))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        results = fut.result()
+                        writer.write(results)
+                        written += len(results)
+            for fut in pending:
+                results = fut.result()
+                writer.write(results)
+                written += len(results)
+        return written
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.run", description="Generate onboarding outputs for a client CSV.")
+    parser.add_argument("input", help="client CSV with name, company, services_requested, notes")
+    parser.add_argument("-o", "--output", required=True, help="output file (.jsonl or .parquet)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="rows per worker task")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="model batch size")
+    parser.add_argument("--resume", action="store_true", help="skip rows already present in the JSONL output")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    errors = []
+    try:
+        written = run(args.input, args.output, workers=args.workers, shard_size=args.shard_size,
+                      batch_size=args.batch_size, resume=args.resume, errors=errors)
+    except (ValidationError, ValueError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    for row, message in errors:
+        LOGGER.warning("Skipped row %d: %s", row, message)
+    print(f"Wrote {written} rows to {args.output} ({len(errors)} invalid rows skipped)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
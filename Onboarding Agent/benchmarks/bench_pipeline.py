@@ -0,0 +1,229 @@
+"""
+bench_pipeline.py
+Offline benchmark for the onboarding pipeline and LocalAI.
+
+Generates synthetic client CSVs, then measures CSV load/validation throughput,
+summarize/generate latency percentiles (stub pipeline and the real model, which
+falls back to the rule-based path when the model is not downloaded), model load
+time and peak memory. Results can be saved as a JSON baseline and later runs are
+compared against it.
+
+Run with:
+    python benchmarks/bench_pipeline.py --save-baseline      # record benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py                      # compare, exit 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Never reach out to the Hugging Face hub from a benchmark run.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from app.ai_local import LocalAI
+from app.core import load_and_validate_csv, iter_validated_csv
+
+DEFAULT_SIZES = "10,1000,100000"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+FIRST = ["Alice", "Rahul", "Maria", "Chen", "Fatima", "John", "Priya", "Lukas"]
+LAST = ["Johnson", "Mehta", "Garcia", "Wei", "Khan", "Smith", "Nair", "Müller"]
+COMPANIES = ["TechNova", "FinEdge", "GreenLeaf", "Blue Harbor", "Quantix", "Northwind"]
+SERVICES = ["Web Development", "SEO", "AI Automation", "Analytics", "Ads", "Branding"]
+NOTE_PARTS = [
+    "Wants quick onboarding, prefers weekly updates.",
+    "Interested in proof-of-concept first.",
+    "Needs ad setup and campaign strategy before the holiday season.",
+    "Looking to improve organic traffic and set up analytics dashboards.",
+    "Has an in-house team and needs help with integration and training.",
+    "Budget approved for two quarters; stakeholders expect a monthly report.",
+]
+
+# metric name suffix -> whether a larger value is better
+HIGHER_IS_BETTER = ("rows_per_sec",)
+# Changes smaller than this (per unit suffix) are timer/allocator noise, never a regression
+NOISE_FLOOR = {"_ms": 0.5, "_mb": 1.0, "_sec": 0.5}
+
+
+def make_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,company,services_requested,notes\n")
+        for _ in range(rows):
+            notes = " ".join(rng.sample(NOTE_PARTS, rng.randint(1, 4)))
+            f.write(f"{rng.choice(FIRST)} {rng.choice(LAST)},{rng.choice(COMPANIES)},"
+                    f"\"{rng.choice(SERVICES)}\",\"{notes}\"\n")
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": statistics.fmean(ordered)}
+
+
+def best_time(call, rows):
+    """Fastest of a few untraced runs; small files get more runs so the timing is not just noise."""
+    timings = []
+    for _ in range(max(1, min(10, 100_000 // rows))):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_alloc(call):
+    tracemalloc.start()
+    result = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def bench_load(path, rows):
+    load = lambda: load_and_validate_csv(path)
+    stream = lambda: sum(len(batch) for batch in iter_validated_csv(path))
+
+    df, full_peak = peak_alloc(load)
+    assert len(df) == rows
+    streamed, stream_peak = peak_alloc(stream)
+    assert streamed == rows
+
+    return {
+        "load.rows_per_sec": rows / best_time(load, rows),
+        "load.peak_alloc_mb": full_peak / 2 ** 20,
+        "stream.rows_per_sec": rows / best_time(stream, rows),
+        "stream.peak_alloc_mb": stream_peak / 2 ** 20,
+    }
+
+
+class StubPipeline:
+    """Stands in for a HF pipeline so wrapper overhead can be timed without a model."""
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self, texts, **kwargs):
+        return [{self.key: t[:80]} for t in texts]
+
+
+def bench_latency(ai, texts, prefix):
+    results = {}
+    for name, call in (("summarize", ai.summarize), ("generate", ai.generate)):
+        samples = []
+        for text in texts:
+            start = time.perf_counter()
+            call(text)
+            samples.append((time.perf_counter() - start) * 1000)
+        results.update({f"{prefix}.{name}.{k}": v for k, v in percentiles(samples).items()})
+    return results
+
+
+def run(sizes, calls, skip_real):
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"clients_{rows}.csv")
+            make_csv(path, rows)
+            metrics.update({f"csv_{rows}.{k}": v for k, v in bench_load(path, rows).items()})
+            print(f"  csv {rows:>7} rows: {metrics[f'csv_{rows}.load.rows_per_sec']:,.0f} rows/s "
+                  f"(streamed {metrics[f'csv_{rows}.stream.rows_per_sec']:,.0f} rows/s)")
+
+    rng = random.Random(1)
+    texts = [" ".join(rng.sample(NOTE_PARTS, 3)) for _ in range(calls)]
+
+    stub = LocalAI(cache=False)
+    stub._summarizer = StubPipeline("summary_text")
+    stub._generator = StubPipeline("generated_text")
+    metrics.update(bench_latency(stub, texts, "stub"))
+    print(f"  stub summarize p95: {metrics['stub.summarize.p95_ms']:.3f} ms")
+
+    info = {}
+    if not skip_real:
+        real = LocalAI(cache=False)
+        start = time.perf_counter()
+        info["model_available"] = real.warmup()
+        metrics["model.load_sec"] = time.perf_counter() - start
+        metrics.update(bench_latency(real, texts, "real"))
+        print(f"  model available: {info['model_available']}, load {metrics['model.load_sec']:.2f} s, "
+              f"summarize p95 {metrics['real.summarize.p95_ms']:.1f} ms")
+
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics, info
+
+
+def compare(metrics, baseline, tolerance):
+    """Return a list of human-readable regressions against the baseline metrics."""
+    regressions = []
+    for name, old in baseline.items():
+        new = metrics.get(name)
+        if new is None or not old:
+            continue
+        floor = next((v for suffix, v in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+        if name.endswith(HIGHER_IS_BETTER):
+            if new < old * (1 - tolerance):
+                regressions.append(f"{name}: {new:.4g} < baseline {old:.4g}")
+        elif new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(f"{name}: {new:.4g} > baseline {old:.4g}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"CSV row counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--calls", type=int, default=20, help="model calls per latency measurement")
+    parser.add_argument("--skip-real", action="store_true", help="skip the real LocalAI/model measurements")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default: 0.25)")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    print(f"Benchmarking sizes={sizes} calls={args.calls}")
+    metrics, info = run(sizes, args.calls, args.skip_real)
+    report = {"python": platform.python_version(), "machine": platform.machine(),
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "info": info, "metrics": metrics}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("info", {}).get("model_available") != info.get("model_available"):
+        print("Note: model availability differs from the baseline; real.* metrics are not comparable.")
+        baseline["metrics"] = {k: v for k, v in baseline["metrics"].items() if not k.startswith(("real.", "model."))}
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print("OK, no regressions." if not regressions else f"{len(regressions)} regression(s).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
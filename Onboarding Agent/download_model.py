@@ -1,9 +1,40 @@
+import argparse
+
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
-MODEL_NAME = "sshleifer/distilbart-cnn-12-6"
+from app.ai_local import MODEL_NAME, onnx_model_dir
+
+SAMPLE_NOTES = ("Wants quick onboarding, prefers weekly updates. Interested in SEO and analytics "
+                "for their new product launch next quarter.")
+
+
+def export_onnx(model_name):
+    """Export model_name to ONNX Runtime format and print a summary from each backend for comparison."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import pipeline
+
+    out_dir = onnx_model_dir(model_name)
+    print(f"Exporting {model_name} to ONNX: {out_dir}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+
+    ort = pipeline("summarization", model=ORTModelForSeq2SeqLM.from_pretrained(out_dir), tokenizer=tokenizer)
+    pt = pipeline("summarization", model=model_name, tokenizer=tokenizer, device=-1)
+    print("torch:", pt(SAMPLE_NOTES, max_length=60, min_length=10)[0]["summary_text"].strip())
+    print("onnx: ", ort(SAMPLE_NOTES, max_length=60, min_length=10)[0]["summary_text"].strip())
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the local model (and optionally export it to ONNX).")
+    parser.add_argument("--onnx", action="store_true",
+                        help="also export an ONNX Runtime model for ONBOARDING_AI_BACKEND=onnx (needs optimum[onnxruntime])")
+    args = parser.parse_args()
+
     print(f"Downloading model: {MODEL_NAME}")
     AutoTokenizer.from_pretrained(MODEL_NAME)
     AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
     print("Model downloaded successfully.")
+    if args.onnx:
+        export_onnx(MODEL_NAME)
+        print("ONNX export complete.")
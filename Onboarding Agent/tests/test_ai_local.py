@@ -0,0 +1,126 @@
+"""
+tests/test_ai_local.py
+Batching and caching behaviour of LocalAI, using a fake pipeline instead of a model.
+"""
+import sqlite3
+import pytest
+from app import ai_local
+from app.ai_local import LocalAI, _length_buckets
+from app.cache import ResultCache
+
+class FakePipeline:
+    def __init__(self, key):
+        self.key = key
+        self.inputs = []
+
+    def __call__(self, texts, **kwargs):
+        self.inputs.extend(texts)
+        return [{self.key: f"out:{t}"} for t in texts]
+
+def make_ai(tmp_path):
+    ai = LocalAI(cache=ResultCache(str(tmp_path / "cache.sqlite")))
+    ai._summarizer = FakePipeline("summary_text")
+    ai._generator = FakePipeline("generated_text")
+    return ai
+
+def test_length_buckets_group_similar_lengths():
+    texts = ["aaaa", "a", "aaa", "aa"]
+    assert _length_buckets(texts, 2) == [[1, 3], [2, 0]]
+
+def test_batch_preserves_order_and_dedupes(tmp_path):
+    ai = make_ai(tmp_path)
+    out = ai.summarize_batch(["long note here", "short", "short"])
+    assert out == ["out:long note here", "out:short", "out:short"]
+    assert sorted(ai._summarizer.inputs) == ["long note here", "short"]
+
+def test_cache_hit_skips_model(tmp_path):
+    ai = make_ai(tmp_path)
+    ai.generate("hello")
+    ai.generate("hello")
+    assert ai._generator.inputs == ["hello"]
+    assert ai.cache.stats()["hits"] == 1
+
+    # A fresh instance on the same file is served from disk.
+    again = LocalAI(cache=ResultCache(str(tmp_path / "cache.sqlite")))
+    assert again.generate("hello") == "out:hello"
+    assert again._generator is None
+
+def test_cache_key_includes_params(tmp_path):
+    ai = make_ai(tmp_path)
+    ai.summarize("note", max_length=50)
+    ai.summarize("note", max_length=60)
+    assert ai._summarizer.inputs == ["note", "note"]
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["entries"] == 2
+
+def test_locked_cache_falls_back_to_model(tmp_path):
+    class LockedCache:
+        def get_many(self, keys):
+            raise sqlite3.OperationalError("database is locked")
+        set_many = get_many
+    ai = make_ai(tmp_path)
+    ai.cache = LockedCache()
+    assert ai.summarize_batch(["a", "b"]) == ["out:a", "out:b"]
+
+def test_registry_shares_one_model_across_tasks_and_instances(monkeypatch, tmp_path):
+    loads = []
+    class FakeAuto:
+        @staticmethod
+        def from_pretrained(name):
+            loads.append(name)
+            return FakeModel()
+    class FakeModel:
+        def eval(self):
+            return self
+    built = []
+    def fake_pipeline(task, model, tokenizer, device):
+        built.append((task, model))
+        return FakePipeline("summary_text" if task == "summarization" else "generated_text")
+    monkeypatch.setattr(ai_local, "_MODELS", {})
+    monkeypatch.setattr(ai_local, "_PIPELINES", {})
+    monkeypatch.setattr(ai_local, "AutoTokenizer", FakeAuto)
+    monkeypatch.setattr(ai_local, "AutoModelForSeq2SeqLM", FakeAuto)
+    monkeypatch.setattr(ai_local, "pipeline", fake_pipeline)
+
+    first = LocalAI(cache=False)
+    assert first.warmup() is True
+    second = LocalAI(cache=False)
+    second.generate("hi")
+    assert len(loads) == 2  # one tokenizer + one model, loaded once
+    assert [t for t, _ in built] == ["summarization", "text2text-generation"]
+    assert built[0][1] is built[1][1]
+    assert second._generator is first._generator
+
+def test_failed_load_is_not_retried(monkeypatch):
+    attempts = []
+    def failing(*args, **kwargs):
+        attempts.append(args)
+        raise OSError("no model")
+    monkeypatch.setattr(ai_local, "get_pipeline", failing)
+    ai = LocalAI(cache=False)
+    assert ai.warmup() is False
+    ai.summarize("One. Two. Three.")
+    assert len(attempts) == 1
+
+def test_backend_is_validated_and_scopes_cache(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        LocalAI(backend="tpu", cache=False)
+    monkeypatch.setenv("ONBOARDING_AI_BACKEND", "int8")
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    int8 = LocalAI(cache=cache)
+    assert int8.backend == "int8"
+    int8._summarizer = FakePipeline("summary_text")
+    int8.summarize("note")
+
+    fp32 = LocalAI(cache=cache, backend="torch")
+    fp32._summarizer = FakePipeline("summary_text")
+    fp32.summarize("note")
+    assert fp32._summarizer.inputs == ["note"]
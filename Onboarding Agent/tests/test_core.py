@@ -5,7 +5,7 @@ Contains at least 4 tests. One test is intentionally failing to practice debuggi
 import io
 import pytest
 import pandas as pd
-from app.core import load_and_validate_csv, OnboardingAssistant, ValidationError
+from app.core import load_and_validate_csv, iter_validated_csv, OnboardingAssistant, ValidationError
 
 SAMPLE_CSV = """name,company,services_requested,notes
 Alice,Acme Inc,SEO;Analytics,Looking to improve organic traffic and set up analytics.
@@ -33,3 +33,46 @@ def test_onboarding_generation_fallback():
 def test_intentionally_failing_example():
     # This test is intentionally failing so students debug.
     assert 1 + 1 == 3
+
+class StubAI:
+    """Records batched calls instead of running a model."""
+    def __init__(self):
+        self.calls = []
+
+    def summarize_batch(self, texts, batch_size=8, **kwargs):
+        self.calls.append(('summarize', len(texts)))
+        return [f"Summary of: {t}" for t in texts]
+
+    def generate_batch(self, prompts, batch_size=8, **kwargs):
+        self.calls.append(('generate', len(prompts)))
+        return ["- Step one\n- Step two\n- Step three" for _ in prompts]
+
+def test_process_dataframe_batches_each_stage():
+    df = load_and_validate_csv(io.StringIO(SAMPLE_CSV))
+    ai = StubAI()
+    out = OnboardingAssistant(ai=ai).process_dataframe(df)
+    assert list(out['name']) == ['Alice', 'Bob']
+    assert out.loc[0, 'summary'].startswith('Summary of: Looking')
+    assert out.loc[1, 'plan'] == ['Step one', 'Step two', 'Step three']
+    assert ai.calls == [('summarize', 2), ('generate', 2), ('generate', 2)]
+
+def test_process_batch_skips_blank_notes():
+    ai = StubAI()
+    records = [{'name': 'Alice', 'company': 'Acme', 'notes': ''},
+               {'name': 'Bob', 'company': 'Example', 'notes': 'Needs ads.'}]
+    out = OnboardingAssistant(ai=ai).process_batch(records)
+    assert out[0]['summary'] == 'No notes provided.'
+    assert ai.calls[0] == ('summarize', 1)
+
+def test_iter_validated_csv_streams_batches_and_reports_bad_rows():
+    csv = SAMPLE_CSV + ",No Name Co,Ads,Missing a name.\nCara,Cara Co,SEO,\n"
+    errors = []
+    batches = list(iter_validated_csv(io.StringIO(csv), chunksize=2, errors=errors))
+    assert [list(b.index) for b in batches] == [[0, 1], [3]]
+    assert batches[1].loc[3, 'notes'] == ''
+    assert errors == [(2, 'missing name')]
+
+def test_iter_validated_csv_checks_header_before_rows():
+    batches = iter_validated_csv(io.StringIO("name,company,notes\nAlice,Acme,Hi\n"))
+    with pytest.raises(ValidationError):
+        next(batches)
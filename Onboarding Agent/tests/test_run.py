@@ -0,0 +1,44 @@
+"""
+tests/test_run.py
+Headless runner: JSONL output and resume-from-checkpoint, run in-process with a stub model.
+"""
+import json
+from app.core import OnboardingAssistant
+from app.run import run, completed_rows
+
+CSV = """name,company,services_requested,notes
+Alice,Acme Inc,SEO,Looking to improve organic traffic.
+Bob,Example LLC,Ads,Needs ad setup.
+Cara,Cara Co,Web,Wants a new site.
+"""
+
+class StubAI:
+    def __init__(self):
+        self.summarized = []
+
+    def summarize_batch(self, texts, **kwargs):
+        self.summarized.extend(texts)
+        return [t.upper() for t in texts]
+
+    def generate_batch(self, prompts, **kwargs):
+        return ["- a\n- b\n- c" for _ in prompts]
+
+def test_run_writes_one_jsonl_line_per_row(tmp_path):
+    src = tmp_path / "clients.csv"
+    src.write_text(CSV)
+    out = tmp_path / "out.jsonl"
+    assert run(str(src), str(out), shard_size=2, assistant=OnboardingAssistant(ai=StubAI())) == 3
+    rows = [json.loads(l) for l in out.read_text().splitlines()]
+    assert [r['row'] for r in rows] == [0, 1, 2]
+    assert rows[1]['summary'] == 'NEEDS AD SETUP.'
+    assert rows[2]['plan'] == ['a', 'b', 'c']
+
+def test_run_resume_skips_completed_rows(tmp_path):
+    src = tmp_path / "clients.csv"
+    src.write_text(CSV)
+    out = tmp_path / "out.jsonl"
+    out.write_text(json.dumps({'row': 0, 'name': 'Alice'}) + "\n" + '{"row": 1, "na')  # torn last line
+    ai = StubAI()
+    assert run(str(src), str(out), resume=True, assistant=OnboardingAssistant(ai=ai)) == 2
+    assert ai.summarized == ['Needs ad setup.', 'Wants a new site.']
+    assert completed_rows(str(out)) == {0, 1, 2}
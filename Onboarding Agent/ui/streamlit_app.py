@@ -1,11 +1,16 @@
 """
 streamlit_app.py
 Simple Streamlit UI to upload CSV and show summaries, onboarding plans, and email drafts.
+The model is loaded once per server process, outputs are cached per file hash and row,
+and rows are paginated and only generated on request.
 Run with: streamlit run ui/streamlit_app.py
 """
 
 import streamlit as st
 import pandas as pd
+import hashlib
+import io
+import math
 import sys, os
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, ROOT)
@@ -13,14 +18,48 @@ sys.path.insert(0, ROOT)
 from app.core import load_and_validate_csv, OnboardingAssistant
 st.set_page_config(page_title="Local Onboarding Assistant", layout="wide")
 
+PAGE_SIZES = [10, 25, 50, 100]
+
+
+@st.cache_resource(show_spinner="Loading model...")
+def get_assistant() -> OnboardingAssistant:
+    """One warmed-up assistant (and model) shared by every rerun and session."""
+    assistant = OnboardingAssistant()
+    assistant.warmup()
+    return assistant
+
+
+@st.cache_data(show_spinner=False)
+def load_csv(file_hash: str, _data: bytes) -> pd.DataFrame:
+    return load_and_validate_csv(io.BytesIO(_data))
+
+
+@st.cache_data(show_spinner=False, max_entries=10_000)
+def generate_rows(file_hash: str, rows: tuple, _records: list) -> list:
+    """Outputs for the given row indices of one file; cached on (file hash, rows)."""
+    return get_assistant().process_batch(_records)
+
+
+def generate(file_hash, df, indices):
+    """Generate outputs for rows not produced yet in this session and remember them."""
+    outputs = st.session_state.setdefault("outputs", {})
+    todo = [i for i in indices if (file_hash, i) not in outputs]
+    if todo:
+        records = df.loc[todo].to_dict("records")
+        for i, out in zip(todo, generate_rows(file_hash, tuple(todo), records)):
+            outputs[(file_hash, i)] = out
+
+
 st.title("Local AI — Customer Onboarding Assistant")
 
 uploaded = st.file_uploader("Upload a client CSV", type=['csv'])
 use_preview = st.checkbox("Show raw CSV preview", value=True)
 
 if uploaded:
+    data = uploaded.getvalue()
+    file_hash = hashlib.sha256(data).hexdigest()
     try:
-        df = load_and_validate_csv(uploaded)
+        df = load_csv(file_hash, data)
     except Exception as e:
         st.error(f"CSV validation error: {e}")
         st.stop()
@@ -29,20 +68,34 @@ if uploaded:
         st.subheader("CSV Preview")
         st.dataframe(df.head())
 
-    assistant = OnboardingAssistant()
     st.subheader("Generated outputs")
 
-    for idx, row in df.iterrows():
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Clients per page", PAGE_SIZES, index=0)
+    pages = max(1, math.ceil(len(df) / page_size))
+    page = col_page.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+    page_index = list(df.index[(page - 1) * page_size:page * page_size])
+
+    if st.button(f"Generate all {len(page_index)} clients on this page"):
+        with st.spinner("Generating outputs..."):
+            generate(file_hash, df, page_index)
+
+    outputs = st.session_state.get("outputs", {})
+    for idx in page_index:
+        row = df.loc[idx]
         with st.expander(f"{row.get('name', 'Unknown')} — {row.get('company', '')}"):
-            notes = row.get('notes', '')
-            summary = assistant.summarize_client(notes)
-            plan = assistant.generate_onboarding_plan(summary)
-            email = assistant.generate_welcome_email(row.get('name', ''), row.get('company', ''), summary)
+            out = outputs.get((file_hash, idx))
+            if out is None:
+                if not st.button("Generate", key=f"generate-{file_hash}-{idx}"):
+                    continue
+                with st.spinner("Generating..."):
+                    generate(file_hash, df, [idx])
+                out = st.session_state["outputs"][(file_hash, idx)]
 
             st.markdown("**Summary**")
-            st.write(summary)
+            st.write(out['summary'])
             st.markdown("**3-step onboarding plan**")
-            for s in plan:
+            for s in out['plan']:
                 st.write(f"- {s}")
             st.markdown("**Welcome email draft**")
-            st.code(email)
+            st.code(out['email'])
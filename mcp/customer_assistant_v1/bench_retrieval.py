@@ -0,0 +1,125 @@
+"""
+Offline recall/latency benchmark for policy retrieval (no LLM, no MCP servers).
+
+Chunks home_depot_policy.pdf the same way as ingestPolicy.py, embeds it in an
+in-memory vector store with the shared embeddings, and runs a fixed set of
+customer questions through each retrieval strategy. A question counts as
+recalled when one of the returned chunks contains its answer phrase. Every
+timed search starts with an empty query-embedding cache, so repeats measure
+cold lookups like a new customer question.
+
+    python bench_retrieval.py
+    python bench_retrieval.py --cross-encoder --repeat 5
+"""
+import argparse
+import os
+import statistics
+import time
+
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from embeddings import get_embeddings
+from hybrid_retriever import BM25Index, HybridRetriever
+from ingestPolicy import CHUNK_OVERLAP, CHUNK_SIZE, chunk_page, iter_pages
+
+PDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "home_depot_policy.pdf")
+
+# (question, phrase the retrieved context must contain)
+QUESTIONS = [
+    ("How long do I have to cancel my protection plan and get a full refund?", "ninety (90) days"),
+    ("What happens if my product needs a fourth repair for the same problem?", "fourth (4th) repair"),
+    ("How much will I get back for spoiled food when my fridge breaks down?", "up to $300"),
+    ("Do you pay for a laundromat while my washer is being repaired?", "laundry cleaning services"),
+    ("What reimbursement do I get on lawn mower maintenance parts?", "30% reimbursement"),
+    ("Which products qualify for pickup and delivery?", "$799 and above"),
+    ("How long is a water heater covered under the plan?", "period of five (5) years"),
+    ("Is there a deductible to get my product serviced?", "no deductible"),
+    ("Can I transfer the plan to someone who buys my product?", "transferred to a subsequent owner"),
+    ("Is theft or loss of the product covered?", "theft or loss"),
+    ("How much notice do you give before you cancel my plan?", "sixty (60) days before cancellation"),
+    ("What is the minimum payout if an arbitrator rules in my favor?", "$7,500"),
+    ("What are the cancellation rules for Alabama residents?", "twenty (20) days"),
+    ("Is damage from a bad installation covered?", "factory authorized installation"),
+    ("What is the limit on the preventative maintenance rebate?", "$500 limit on the preventative maintenance rebate"),
+    ("What phone number do I call to file a claim?", "1-800-466-3337"),
+    ("Are products used for commercial purposes covered?", "commercial purposes"),
+    ("Can I renew my replacement plan?", "not renewable"),
+    ("What discount do I get on refrigerator water filters?", "25% reimbursement"),
+    ("Where do I mail my cancellation request?", "p.o. box 1818"),
+]
+
+
+def normalize(text):
+    text = text.replace("’", "'").replace("“", '"').replace("”", '"')
+    return " ".join(text.lower().split())
+
+
+def load_chunks(path=PDF_PATH):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks, section = [], None
+    for number, text in iter_pages(path):
+        page_chunks, section = chunk_page(os.path.basename(path), number, text, section, splitter)
+        chunks.extend(text for _, text, _ in page_chunks)
+    return chunks
+
+
+def strategies(store, chunks, embeddings, cross_encoder):
+    bm25 = BM25Index(chunks)
+    hybrid = lambda rerank: HybridRetriever(store, texts=chunks, embeddings=embeddings, rerank=rerank)
+    found = {
+        "vector k=8 (before)": lambda q: [d.page_content for d in store.similarity_search(q, k=8)],
+        "vector k=3": lambda q: [d.page_content for d in store.similarity_search(q, k=3)],
+        "bm25 k=3": lambda q: [chunks[i] for i, _ in bm25.search(q, k=3)],
+        "hybrid k=3": hybrid("none").search,
+        "hybrid+mmr k=3": hybrid("mmr").search,
+    }
+    if cross_encoder:
+        found["hybrid+cross-encoder k=3"] = hybrid("cross-encoder").search
+    return found
+
+
+def evaluate(search, repeat, embeddings):
+    recalled, context_chars, samples = 0, 0, []
+    for question, phrase in QUESTIONS:
+        for _ in range(repeat):
+            embeddings.clear_query_cache()
+            start = time.perf_counter()
+            results = search(question)
+            samples.append((time.perf_counter() - start) * 1000)
+        recalled += any(normalize(phrase) in normalize(text) for text in results)
+        context_chars += sum(len(text) for text in results)
+    samples.sort()
+    return {
+        "recall": recalled / len(QUESTIONS),
+        # ~4 characters per token for English text
+        "context_tokens": context_chars / len(QUESTIONS) / 4,
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=PDF_PATH, help="policy PDF to index")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per question")
+    parser.add_argument("--cross-encoder", action="store_true", help="also benchmark the cross-encoder reranker")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf)
+    embeddings = get_embeddings()
+    store = InMemoryVectorStore(embeddings)
+    start = time.perf_counter()
+    store.add_texts(chunks)
+    print(f"{len(chunks)} chunks indexed in {time.perf_counter() - start:.2f}s, {len(QUESTIONS)} questions")
+
+    print(f"{'strategy':<26} {'recall':>7} {'ctx tok':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, search in strategies(store, chunks, embeddings, args.cross_encoder).items():
+        search(QUESTIONS[0][0])   # warm caches and lazy models outside the timing
+        r = evaluate(search, args.repeat, embeddings)
+        print(f"{name:<26} {r['recall']:>7.0%} {r['context_tokens']:>8.0f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
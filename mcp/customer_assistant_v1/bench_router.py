@@ -0,0 +1,164 @@
+"""
+Accuracy/latency benchmark for the local intent router (intent_router.py).
+
+Routes a labelled set of customer messages, written differently from the
+router's own examples, and reports:
+  accuracy     routed intent == expected intent ("general" = all tools)
+  safe         routing kept every tool the message needs (general is always safe)
+  bad direct   messages wrongly answered with a canned reply
+  direct       share of messages answered without the LLM
+  tools        average tools bound per agent run (out of all of them)
+  route ms     classification time per message (p50 / p95), each with a
+               cold query embedding as for a new customer message
+
+With --live it also sends every message through MCPAgentService (needs the LLM
+settings in .env and the MCP servers), once with the router and once without,
+and reports the mean turn latency of each.
+
+    python bench_router.py
+    python bench_router.py --live
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from intent_router import DIRECT_INTENTS, TOOLSETS, IntentRouter
+
+ALL_TOOLS = set().union(*TOOLSETS.values())
+
+# (message, expected intent; "general" when every tool may be needed)
+MESSAGES = [
+    ("hello!", "greeting"),
+    ("hi there, good afternoon", "greeting"),
+    ("heyy", "greeting"),
+    ("many thanks", "thanks"),
+    ("ok thank you", "thanks"),
+    ("perfect, thanks for the help", "thanks"),
+    ("bye bye", "goodbye"),
+    ("that's everything, goodbye", "goodbye"),
+    ("what's my customer ID", "customer_id"),
+    ("can you tell me my customer id please", "customer_id"),
+    ("where's my package?", "orders"),
+    ("what orders have I placed?", "orders"),
+    ("when does order O002 arrive?", "orders"),
+    ("did my water heater order ship yet?", "orders"),
+    ("what payment method did I use for order O001?", "orders"),
+    ("how much did I spend on my last order?", "orders"),
+    ("do you sell gas lawn mowers?", "products"),
+    ("recommend a drill under 20000", "products"),
+    ("is the French door refrigerator available?", "products"),
+    ("what does product P003 cost?", "products"),
+    ("show me appliances rated above 4", "products"),
+    ("any water heaters in stock?", "products"),
+    ("how do I cancel my plan and get a refund?", "policy"),
+    ("does the plan cover accidental damage?", "policy"),
+    ("what number do I call to make a claim?", "policy"),
+    ("is food spoilage covered if my fridge breaks?", "policy"),
+    ("what happens after a fourth repair?", "policy"),
+    ("can I return the drill from order O001?", "returns"),
+    ("am I still within the return window for my fridge?", "returns"),
+    ("I'd like a refund for order O002", "returns"),
+    ("can my broken mower be replaced?", "returns"),
+    ("thanks, and where is my order O001?", "orders"),
+    ("hi, can I return my drill?", "returns"),
+    ("compare my last order's price with similar products and tell me the return rules", "general"),
+    ("I have a question", "general"),
+]
+
+
+def needed_tools(intent):
+    return ALL_TOOLS if intent == "general" else TOOLSETS.get(intent, set())
+
+
+def evaluate(router, repeat):
+    correct = safe = bad_direct = direct = 0
+    tools_bound, agent_runs, samples = 0, 0, []
+    misses = []
+    for message, expected in MESSAGES:
+        for _ in range(repeat):
+            router.embeddings.clear_query_cache()
+            start = time.perf_counter()
+            intent, similarity = router.classify(message)
+            samples.append((time.perf_counter() - start) * 1000)
+        routed = intent or "general"
+        correct += routed == expected
+        if routed in DIRECT_INTENTS:
+            direct += 1
+            bad_direct += routed != expected
+            safe += routed == expected
+        else:
+            bound = needed_tools(routed)
+            safe += bound >= needed_tools(expected) or expected in DIRECT_INTENTS
+            tools_bound += len(bound)
+            agent_runs += 1
+        if routed != expected:
+            misses.append((message, expected, routed, similarity))
+    samples.sort()
+    n = len(MESSAGES)
+    return {
+        "accuracy": correct / n,
+        "safe": safe / n,
+        "bad_direct": bad_direct,
+        "direct": direct / n,
+        "tools": tools_bound / agent_runs if agent_runs else 0.0,
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+        "misses": misses,
+    }
+
+
+async def live(customer_id):
+    """Mean turn latency over MESSAGES with and without the router."""
+    from mcp_client import MCPAgentService
+
+    service = MCPAgentService()
+    await service.initialize()
+    router = service.router
+    results = {}
+    try:
+        for label, active in (("with router", router), ("without router", None)):
+            service.router = active
+            samples = []
+            for i, (message, _) in enumerate(MESSAGES):
+                start = time.perf_counter()
+                await service.run(message, customer_id, f"bench-router-{label}-{i}")
+                samples.append(time.perf_counter() - start)
+            results[label] = samples
+    finally:
+        service.router = router
+        await service.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed classifications per message")
+    parser.add_argument("--k", type=int, default=5, help="neighbours that vote")
+    parser.add_argument("--live", action="store_true", help="also time full turns through MCPAgentService")
+    parser.add_argument("--customer-id", default="C001", help="customer for --live runs")
+    args = parser.parse_args()
+
+    from embeddings import get_embeddings
+
+    start = time.perf_counter()
+    router = IntentRouter(get_embeddings(), k=args.k)
+    print(f"Router built in {time.perf_counter() - start:.2f}s, {len(MESSAGES)} test messages")
+    router.classify(MESSAGES[0][0])    # load the embedding model outside the timing
+
+    r = evaluate(router, args.repeat)
+    print(f"accuracy {r['accuracy']:.0%}  safe {r['safe']:.0%}  bad direct {r['bad_direct']}  "
+          f"direct {r['direct']:.0%}  tools {r['tools']:.1f}/{len(ALL_TOOLS)}  "
+          f"route p50 {r['p50_ms']:.2f}ms p95 {r['p95_ms']:.2f}ms")
+    for message, expected, routed, similarity in r["misses"]:
+        print(f"  {message!r}: expected {expected}, routed {routed} ({similarity:.2f})")
+
+    if args.live:
+        for label, samples in asyncio.run(live(args.customer_id)).items():
+            samples.sort()
+            print(f"{label:<15} mean {statistics.mean(samples):.2f}s "
+                  f"p95 {samples[int(0.95 * (len(samples) - 1))]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark for the MCP servers and the FastAPI app.
+
+For each MCP server it spawns a fresh stdio process and times
+  handshake   process start -> MCP initialize answered
+  list_tools  process start -> tool list received
+  ready       process start -> the server's status tool reports ready
+For the web app it starts uvicorn and times the first answered request and
+the first 200 from /ready (which needs the LLM and MCP settings in .env).
+
+    python fakeSnowflake.py demo.sqlite
+    SNOWFLAKE_FAKE_DB=demo.sqlite python bench_startup.py --runs 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# script -> readiness tool
+SERVERS = {
+    "snowflakeServer.py": "snowflake_status",
+    "loadPolicy.py": "policy_index_status",
+}
+
+
+def _status(result):
+    text = "".join(getattr(block, "text", "") for block in result.content)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {}
+
+
+async def time_server(script, status_tool, timeout):
+    params = StdioServerParameters(command=sys.executable, args=[os.path.join(HERE, script)], cwd=HERE,
+                                   env=dict(os.environ))
+    timings = {}
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            timings["handshake"] = time.perf_counter() - start
+            tools = await session.list_tools()
+            timings["list_tools"] = time.perf_counter() - start
+            if status_tool not in {t.name for t in tools.tools}:
+                return timings
+            while time.perf_counter() - start < timeout:
+                status = _status(await session.call_tool(status_tool, {}))
+                if status.get("ready"):
+                    timings["ready"] = time.perf_counter() - start
+                    break
+                if status.get("error"):
+                    print(f"{script}: not ready: {status['error']}")
+                    break
+                await asyncio.sleep(0.05)
+    return timings
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_web_app(timeout):
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastApi:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    timings = {}
+    try:
+        with httpx.Client(timeout=2) as client:
+            while time.perf_counter() - start < timeout and proc.poll() is None:
+                try:
+                    res = client.get(f"http://127.0.0.1:{port}/ready")
+                except httpx.TransportError:
+                    time.sleep(0.05)
+                    continue
+                timings.setdefault("first_response", time.perf_counter() - start)
+                if res.status_code == 200:
+                    timings["ready"] = time.perf_counter() - start
+                    break
+                time.sleep(0.1)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return timings
+
+
+def summarize(name, runs):
+    keys = []
+    for run in runs:
+        keys += [k for k in run if k not in keys]
+    cells = []
+    for key in keys:
+        values = [run[key] for run in runs if key in run]
+        cells.append(f"{key} {statistics.median(values):.2f}s ({len(values)}/{len(runs)})")
+    print(f"{name:<20} " + ", ".join(cells or ["no response"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per target (median reported)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for readiness")
+    parser.add_argument("--skip-web", action="store_true", help="only benchmark the MCP servers")
+    args = parser.parse_args()
+
+    for script, status_tool in SERVERS.items():
+        runs = []
+        for _ in range(args.runs):
+            try:
+                runs.append(asyncio.run(time_server(script, status_tool, args.timeout)))
+            except Exception as e:
+                print(f"{script}: failed to start ({type(e).__name__}: {e})")
+                break
+        if runs:
+            summarize(script, runs)
+
+    if not args.skip_web:
+        summarize("fastApi.py", [time_web_app(args.timeout) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "on").lower() != "off"
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "./embedding_cache.sqlite")    # "off" disables
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+
+# -----------------------------
+#   CACHED EMBEDDINGS
+# -----------------------------
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that never computes the same vector twice.
+
+    Document vectors are stored in a SQLite table keyed on a hash of
+    (model, text), so rebuilding a Chroma collection only embeds chunks that
+    were not seen before, across runs and processes. Query vectors go into an
+    in-memory LRU of `query_cache_size` entries. Misses are embedded
+    `batch_size` texts at a time.
+    """
+
+    def __init__(self, base, model_name, cache_path=None, batch_size=EMBEDDING_BATCH_SIZE,
+                 query_cache_size=QUERY_CACHE_SIZE):
+        self.base = base
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if cache_path:
+            self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+            with self._conn:
+                # Several MCP server processes may share the cache file
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.chunks_embedded = 0
+        self.chunks_cached = 0
+        self.chunk_seconds = 0.0
+        self.queries = 0
+        self.queries_cached = 0
+        self.query_seconds = 0.0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self, keys):
+        if self._conn is None or not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for key, blob in self._conn.execute(f"SELECT key, vector FROM vectors WHERE key IN ({marks})", part):
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items):
+        if self._conn is None or not items:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items]
+            )
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        keys = [self._key(t) for t in texts]
+        vectors = self._load(list(set(keys)))
+        missing = list(dict.fromkeys(k for k in keys if k not in vectors))
+        text_for = dict(zip(keys, texts))
+
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            embedded = self.base.embed_documents([text_for[k] for k in batch])
+            vectors.update(zip(batch, embedded))
+            self._store(list(zip(batch, embedded)))
+
+        self.chunks_embedded += len(missing)
+        self.chunks_cached += len(texts) - len(missing)
+        self.chunk_seconds += time.perf_counter() - start
+        return [list(vectors[k]) for k in keys]
+
+    def embed_query(self, text):
+        start = time.perf_counter()
+        with self._lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            with self._lock:
+                self._queries[text] = vector
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+        else:
+            self.queries_cached += 1
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - start
+        return list(vector)
+
+    def clear_query_cache(self):
+        with self._lock:
+            self._queries.clear()
+
+    def stats(self):
+        chunks = self.chunks_embedded + self.chunks_cached
+        return {
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_cached": self.chunks_cached,
+            "chunks_per_sec": chunks / self.chunk_seconds if self.chunk_seconds else 0.0,
+            "queries": self.queries,
+            "queries_cached": self.queries_cached,
+            "queries_per_sec": self.queries / self.query_seconds if self.query_seconds else 0.0,
+        }
+
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Process-wide CachedEmbeddings over HuggingFaceEmbeddings, configured from the environment."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            base = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL,
+                encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE, "normalize_embeddings": EMBEDDING_NORMALIZE}
+            )
+            cache_path = None if EMBEDDING_CACHE.lower() == "off" else EMBEDDING_CACHE
+            # Normalized and raw vectors differ, so they must not share cache entries
+            model_name = f"{EMBEDDING_MODEL}|normalize={EMBEDDING_NORMALIZE}"
+            _embeddings = CachedEmbeddings(base, model_name, cache_path=cache_path)
+        return _embeddings
@@ -0,0 +1,79 @@
+"""
+Local SQLite stand-in for snowflake.connector, for running the Snowflake MCP
+server and its pool/cache offline.
+
+    python fakeSnowflake.py demo.sqlite        # create a small demo database
+    SNOWFLAKE_FAKE_DB=demo.sqlite python snowflakeServer.py
+"""
+import sqlite3
+import sys
+
+
+def connect(database, **_ignored):
+    """Same call shape as snowflake.connector.connect; extra Snowflake kwargs are ignored."""
+    return sqlite3.connect(database, check_same_thread=False)
+
+
+DEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS CUSTOMERS (
+    CUSTOMER_ID TEXT PRIMARY KEY, NAME TEXT, EMAIL TEXT, CITY TEXT, CREATED_AT TEXT
+);
+CREATE TABLE IF NOT EXISTS PRODUCTS (
+    PRODUCT_ID TEXT PRIMARY KEY, NAME TEXT, BRAND TEXT, CATEGORY TEXT, SUB_CATEGORY TEXT,
+    DESCRIPTION TEXT, SPECIFICATIONS TEXT, PRICE REAL, RATING REAL, CREATED_AT TEXT
+);
+CREATE TABLE IF NOT EXISTS INVENTORY (
+    PRODUCT_ID TEXT PRIMARY KEY, STOCK INTEGER, WAREHOUSE TEXT, UPDATED_AT TEXT
+);
+CREATE TABLE IF NOT EXISTS ORDERS (
+    ORDER_ID TEXT PRIMARY KEY, CUSTOMER_ID TEXT, PRODUCT_ID TEXT, ORDER_DATE TEXT, DELIVERY_DATE TEXT,
+    STATUS TEXT, PAYMENT_METHOD TEXT, SHIPPING_ADDRESS TEXT, TOTAL_AMOUNT REAL, CREATED_AT TEXT
+);
+"""
+
+DEMO_ROWS = {
+    "CUSTOMERS": [
+        ("C001", "Asha Rao", "asha@example.com", "Mumbai", "2024-11-02"),
+        ("C002", "Daniel Cho", "daniel@example.com", "Pune", "2024-12-15"),
+    ],
+    "PRODUCTS": [
+        ("P001", "Cordless Drill 20V", "DeWalt", "Tools", "Power Tools", "Compact drill/driver kit",
+         "20V, 2 batteries", 14999.0, 4.7, "2024-10-01"),
+        ("P002", "French Door Refrigerator", "LG", "Appliances", "Refrigerators", "28 cu. ft. smart fridge",
+         "Wi-Fi, ice maker", 189999.0, 4.5, "2024-10-01"),
+        ("P003", "Electric Water Heater 50 gal", "Rheem", "Plumbing", "Water Heaters", "Tank water heater",
+         "4500W", 45999.0, 4.3, "2024-10-01"),
+        ("P004", "Self-Propelled Lawn Mower", "Honda", "Outdoor", "Lawn Mowers", "21 in. gas mower",
+         "160cc engine", 34999.0, 4.6, "2024-10-01"),
+    ],
+    "INVENTORY": [
+        ("P001", 42, "Mumbai", "2025-01-10"),
+        ("P002", 3, "Pune", "2025-01-10"),
+        ("P003", 0, "Mumbai", "2025-01-10"),
+        ("P004", 12, "Delhi", "2025-01-10"),
+    ],
+    "ORDERS": [
+        ("O001", "C001", "P001", "2025-01-02", "2025-01-06", "Delivered", "Credit Card",
+         "123 Main St, Mumbai", 14999.0, "2025-01-02"),
+        ("O002", "C001", "P003", "2025-02-10", None, "Shipped", "UPI",
+         "123 Main St, Mumbai", 45999.0, "2025-02-10"),
+        ("O003", "C002", "P002", "2024-12-20", "2024-12-28", "Delivered", "Debit Card",
+         "9 Hill Rd, Pune", 189999.0, "2024-12-20"),
+    ],
+}
+
+
+def create_demo_db(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(DEMO_SCHEMA)
+        for table, rows in DEMO_ROWS.items():
+            marks = ",".join("?" * len(rows[0]))
+            conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({marks})", rows)
+    conn.close()
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "demo.sqlite"
+    create_demo_db(target)
+    print(f"Demo database written to {target}")
@@ -1,9 +1,16 @@
+import asyncio
+import json
+import os
+
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.routing import Match
 
 from mcp_client import MCPAgentService
+from sessions import SESSION_COOKIE, SessionStore
+from telemetry import render_metrics, sampled, span
 
 app = FastAPI()
 
@@ -12,6 +19,43 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 
 agent = MCPAgentService()
 
+# One session per browser: cookie -> customer_id + conversation thread
+sessions = SessionStore(ttl=int(os.getenv("SESSION_TTL", "3600")))
+
+# Upper bound on agent runs in flight across all sessions
+request_slots = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_REQUESTS", "8")))
+
+# The agent initializes in the background; chat requests wait this long for it, then get a 503
+READY_WAIT = float(os.getenv("AGENT_READY_WAIT", "30"))
+agent_ready = asyncio.Event()
+agent_state = {"error": None, "task": None}
+
+NOT_READY_REPLY = "⏳ The assistant is still starting up. Please try again in a moment."
+
+
+# -------------------------------------------------------------
+# One span per HTTP request (for /ask/stream: until the stream starts),
+# labelled by route template so each endpoint gets its own latency series.
+# Probes and scrapes are not traced.
+# -------------------------------------------------------------
+UNTRACED_PATHS = {"/metrics", "/ready", "/favicon.ico"}
+
+
+def route_template(request):
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with span(f"http {request.method} {route_template(request)}", path=request.url.path):
+        return await call_next(request)
+
 
 # -------------------------------------------------------------
 # Prevent browser favicon.ico request from becoming customer_id
@@ -21,53 +65,123 @@ async def favicon():
     return Response(status_code=204)
 
 
+# -------------------------------------------------------------
+# Readiness probe: 200 once the agent can take chat requests
+# -------------------------------------------------------------
+@app.get("/ready")
+async def ready():
+    if not agent_ready.is_set():
+        return JSONResponse({"ready": False, "error": agent_state["error"]}, status_code=503)
+    # Also 503 while a dead MCP server is restarted, or if it could not be
+    status = await agent.readiness()
+    is_ready = status["sessions"] == "open"
+    return JSONResponse({"ready": is_ready, **status}, status_code=200 if is_ready else 503)
+
+
+# -------------------------------------------------------------
+# Prometheus scrape: stage latency histograms, token and cache counters
+# -------------------------------------------------------------
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # -------------------------------------------------------------
 # Initialize MCP agent
 # -------------------------------------------------------------
-@app.on_event("startup")
-async def startup_event():
+async def initialize_agent():
     print("🔄 Initializing MCP Agent...")
-    await agent.initialize()
+    try:
+        await agent.initialize()
+    except Exception as e:
+        agent_state["error"] = str(e)
+        print("❌ MCP Agent failed to initialize:", str(e))
+        return
+    agent_ready.set()
     print("✅ MCP Agent Ready!")
 
 
+@app.on_event("startup")
+async def startup_event():
+    # Don't hold up startup on the MCP servers: serve pages and /ready while they load
+    agent_state["task"] = asyncio.create_task(initialize_agent())
+
+
+async def wait_until_ready():
+    if agent_ready.is_set():
+        return True
+    if agent_state["error"]:
+        return False
+    try:
+        await asyncio.wait_for(agent_ready.wait(), READY_WAIT)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def not_ready_response():
+    return JSONResponse({"reply": NOT_READY_REPLY}, status_code=503, headers={"Retry-After": "5"})
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await agent.aclose()
+
+
 # -------------------------------------------------------------
 # UI Entry: Load chat for given customer ID
 # http://localhost:8001/C001
 # -------------------------------------------------------------
 @app.get("/{customer_id}", response_class=HTMLResponse)
 async def home(request: Request, customer_id: str):
-    agent.customer_id = customer_id   # Store customer ID in agent
-    print(f"[INFO] Customer ID set to: {customer_id}")
+    session_id, session = sessions.start(request.cookies.get(SESSION_COOKIE), customer_id)
+    print(f"[INFO] Session for customer {customer_id}: thread {session.thread_id}")
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
+        request,
         "chat.html",
         {
-            "request": request,
             "customer_id": customer_id
         }
     )
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
 
 
 # -------------------------------------------------------------
 # Chat Messaging Endpoint
 # Frontend sends only: { "message": "..." }
-# customer_id is already stored in agent.customer_id
+# customer_id comes from the session cookie set by the UI entry page
 # -------------------------------------------------------------
 @app.post("/ask")
 async def ask(request: Request):
+    session = sessions.get(request.cookies.get(SESSION_COOKIE))
+    if session is None:
+        return JSONResponse(
+            {"reply": "⚠️ Your session has expired. Please reload the page."},
+            status_code=401
+        )
+
+    if not await wait_until_ready():
+        return not_ready_response()
+
     try:
         body = await request.json()
         user_msg = body.get("message")
 
-        print(f"[DEBUG] Incoming msg: {user_msg}")
-        print(f"[DEBUG] Active customer_id: {agent.customer_id}")
+        if sampled():
+            print(f"[DEBUG] Incoming msg from customer {session.customer_id}: {user_msg}")
 
-        # Pass ACTIVE customer ID to agent
-        reply = await agent.run(
-            user_msg,
-            customer_id=agent.customer_id
-        )
+        # One message at a time per session (keeps replies in order),
+        # many sessions in parallel up to MAX_CONCURRENT_REQUESTS
+        async with session.lock:
+            async with request_slots:
+                reply = await agent.run(
+                    user_msg,
+                    customer_id=session.customer_id,
+                    thread_id=session.thread_id
+                )
 
         return JSONResponse({"reply": reply})
 
@@ -79,6 +193,59 @@ async def ask(request: Request):
         )
 
 
+# -------------------------------------------------------------
+# Streaming Chat Endpoint (Server-Sent Events)
+# Same request body as /ask; the response is a stream of
+#   event: token | tool_start | tool_end | done | error
+#   data: {...json...}
+# -------------------------------------------------------------
+def sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: Request):
+    session = sessions.get(request.cookies.get(SESSION_COOKIE))
+    if session is None:
+        return JSONResponse(
+            {"reply": "⚠️ Your session has expired. Please reload the page."},
+            status_code=401
+        )
+
+    if not await wait_until_ready():
+        return not_ready_response()
+
+    # A malformed body gets the same JSON reply as /ask; the stream has not started yet
+    try:
+        body = await request.json()
+        user_msg = body.get("message")
+    except Exception as e:
+        print("[WARN] Invalid /ask/stream body:", str(e))
+        return JSONResponse(
+            {"reply": "⚠️ Something went wrong while processing your request. Please try again."},
+            status_code=400
+        )
+    if sampled():
+        print(f"[DEBUG] Incoming streamed msg from customer {session.customer_id}: {user_msg}")
+
+    async def events():
+        # Held for the whole stream, same ordering/concurrency rules as /ask
+        async with session.lock:
+            async with request_slots:
+                async for event in agent.stream(
+                    user_msg,
+                    customer_id=session.customer_id,
+                    thread_id=session.thread_id
+                ):
+                    yield sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # -------------------------------------------------------------
 # Run FastAPI
 # -------------------------------------------------------------
@@ -1,12 +1,19 @@
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
 import os
-import requests
+import sys
+import httpx
 from bs4 import BeautifulSoup
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 
+from embeddings import get_embeddings
+
 # -------------------------------------------------------
 #  MCP Server Setup
 # -------------------------------------------------------
@@ -23,15 +30,18 @@ WEBSITE_URLS = [
 
 PERSIST_DIR = "./chroma_web_db"
 COLLECTION_NAME = "website_rag"
+STATE_FILE = "url_state.json"       # per-URL ETag / Last-Modified / content hash / chunk ids, inside PERSIST_DIR
+FETCH_CONCURRENCY = 8
+FETCH_TIMEOUT = 10
+
+vectorstore = None
 
 
 # -------------------------------------------------------
-#  Function: Fetch website & extract text
+#  Function: Extract text from a fetched page
 # -------------------------------------------------------
-def fetch_and_clean(url):
-    print(f"Fetching: {url}")
-    r = requests.get(url, timeout=10)
-    soup = BeautifulSoup(r.text, "html.parser")
+def clean_html(html):
+    soup = BeautifulSoup(html, "html.parser")
 
     # Remove scripts, styles, headers, navs
     for tag in soup(["script", "style", "nav", "footer", "header"]):
@@ -44,52 +54,165 @@ def fetch_and_clean(url):
 
 
 # -------------------------------------------------------
-#  Build Vector DB (only once)
+#  Function: Fetch pages concurrently (conditional GET)
 # -------------------------------------------------------
-def initialize_vector_db():
+async def fetch_page(client, url, known):
+    """
+    Fetch one URL, sending the validators from the last crawl.
+    Returns (status, text, validators); text is None when the page is unchanged (304).
+    """
+    headers = {}
+    if known.get("etag"):
+        headers["If-None-Match"] = known["etag"]
+    if known.get("last_modified"):
+        headers["If-Modified-Since"] = known["last_modified"]
 
-    if os.path.exists(PERSIST_DIR):
-        print("Loading existing website Chroma...")
-        embeddings = HuggingFaceEmbeddings()
-        return Chroma(
-            persist_directory=PERSIST_DIR,
-            embedding_function=embeddings,
-            collection_name=COLLECTION_NAME
+    print(f"Fetching: {url}")
+    r = await client.get(url, headers=headers)
+    validators = {"etag": r.headers.get("etag"), "last_modified": r.headers.get("last-modified")}
+    if r.status_code == 304:
+        return r.status_code, None, validators
+    r.raise_for_status()
+    return r.status_code, clean_html(r.text), validators
+
+
+async def fetch_all(urls, state, concurrency=FETCH_CONCURRENCY):
+    """Fetch every URL over one pooled client. Returns {url: (status, text, validators) or exception}."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=FETCH_TIMEOUT, follow_redirects=True) as client:
+        results = await asyncio.gather(
+            *(fetch_page(client, url, state.get(url, {})) for url in urls),
+            return_exceptions=True
         )
+    return dict(zip(urls, results))
+
+
+# -------------------------------------------------------
+#  Crawl state
+# -------------------------------------------------------
+def load_state(persist_dir):
+    path = os.path.join(persist_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(persist_dir, state):
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def chunk_id(url, text):
+    """Deterministic id: the same chunk of the same page always maps to the same vector."""
+    return hashlib.sha1(f"{url}\0{text}".encode("utf-8")).hexdigest()
+
+
+def split_page(url, text, splitter):
+    """Chunks of one page as {id: text}, in page order, without duplicates."""
+    chunks = {}
+    for doc in splitter.create_documents([text]):
+        chunks.setdefault(chunk_id(url, doc.page_content), doc.page_content)
+    return chunks
 
-    print("Scraping website...")
-    documents = []
 
-    for url in WEBSITE_URLS:
-        text = fetch_and_clean(url)
-        documents.append(text)
+# -------------------------------------------------------
+#  Incremental index update
+# -------------------------------------------------------
+async def update_index(vectordb, urls, state, concurrency=FETCH_CONCURRENCY):
+    """
+    Re-crawl `urls` and bring the collection in line with them.
 
+    Pages answering 304, or whose text hashes the same as last time, are left
+    alone. For changed pages only chunks that did not exist before are embedded
+    and upserted, and chunks that disappeared are deleted. URLs that are no longer
+    listed lose their chunks; URLs that fail to fetch keep theirs until next time.
+    `state` is updated in place.
+    """
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,
         chunk_overlap=50
     )
+    stats = {"changed": 0, "unchanged": 0, "failed": 0, "removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+
+    for url in [u for u in state if u not in urls]:
+        stale = state.pop(url).get("chunk_ids", [])
+        if stale:
+            vectordb.delete(ids=stale)
+        stats["removed"] += 1
+        stats["chunks_deleted"] += len(stale)
+
+    fetched = await fetch_all(urls, state, concurrency)
+
+    for url in urls:
+        result = fetched[url]
+        known = state.get(url, {})
+        if isinstance(result, Exception):
+            print(f"Failed to fetch {url}: {result}")
+            stats["failed"] += 1
+            continue
+
+        status, text, validators = result
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None
+        if text is None or content_hash == known.get("content_hash"):
+            state[url] = {**known, **{k: v for k, v in validators.items() if v}}
+            stats["unchanged"] += 1
+            continue
+
+        chunks = split_page(url, text, splitter)
+        old_ids = set(known.get("chunk_ids", []))
+        new_ids = [cid for cid in chunks if cid not in old_ids]
+        stale = [cid for cid in old_ids if cid not in chunks]
 
-    # Convert into document objects
-    docs = splitter.create_documents(documents)
+        if new_ids:
+            vectordb.add_texts(
+                texts=[chunks[cid] for cid in new_ids],
+                metadatas=[{"source": url} for _ in new_ids],
+                ids=new_ids
+            )
+        if stale:
+            vectordb.delete(ids=stale)
 
-    print(f"Website produced {len(docs)} chunks")
+        state[url] = {**validators, "content_hash": content_hash, "chunk_ids": list(chunks)}
+        stats["changed"] += 1
+        stats["chunks_added"] += len(new_ids)
+        stats["chunks_deleted"] += len(stale)
 
-    embeddings = HuggingFaceEmbeddings()
+    return stats
 
-    vectordb = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,
-        persist_directory=PERSIST_DIR,
+
+# -------------------------------------------------------
+#  Build / refresh Vector DB
+# -------------------------------------------------------
+def initialize_vector_db(urls=None, persist_dir=PERSIST_DIR, embeddings=None):
+    """Open (or create) the website collection and refresh it from `urls`."""
+    urls = list(WEBSITE_URLS if urls is None else urls)
+    embeddings = embeddings or get_embeddings()
+    vectordb = Chroma(
+        persist_directory=persist_dir,
+        embedding_function=embeddings,
         collection_name=COLLECTION_NAME
     )
 
-    print("Website vector DB created.")
+    state = load_state(persist_dir)
+    if not state:
+        # Collections built before crawl state was tracked use random chunk ids; start clean
+        legacy = vectordb.get(include=[])["ids"]
+        if legacy:
+            vectordb.delete(ids=legacy)
+    stats = asyncio.run(update_index(vectordb, urls, state))
+    save_state(persist_dir, state)
+
+    print(f"Website vector DB updated: {stats}")
+    if hasattr(embeddings, "stats"):
+        print(f"Embedding: {embeddings.stats()}")
     return vectordb
 
 
-vectorstore = initialize_vector_db()
-print("Website RAG Vector Store is ready.")
-exit(0)
 # -------------------------------------------------------
 #  MCP Tool: Website Query
 # -------------------------------------------------------
@@ -100,7 +223,7 @@ def query_website(query: str) -> list:
     Do NOT mention websites, URLs, crawling, scraping, pages, or technical sources.
     Provide clear, helpful answers.try to drill down into more deeper if you need to go into another links and gets answer,
     and dont ask for further clarification or assistance and end the conversation.
-    
+
     If information is unavailable, respond politely with:
     - "I'm sorry, I don't have that information available."
     - "I don't have access to that information right now."
@@ -112,7 +235,24 @@ def query_website(query: str) -> list:
 
 
 # -------------------------------------------------------
-#  Run MCP Server
+#  Refresh the index, then exit (default) or serve it over MCP
 # -------------------------------------------------------
+def main(argv=None):
+    global vectorstore
+
+    parser = argparse.ArgumentParser(description="Build or incrementally refresh the website RAG index.")
+    parser.add_argument("--url", action="append", dest="urls", help="page to index (repeatable; default: WEBSITE_URLS)")
+    parser.add_argument("--persist-dir", default=PERSIST_DIR, help=f"Chroma directory (default: {PERSIST_DIR})")
+    parser.add_argument("--serve", action="store_true", help="run the MCP server after refreshing the index")
+    args = parser.parse_args(argv)
+
+    # stdout carries the MCP protocol when serving, so progress goes to stderr
+    with contextlib.redirect_stdout(sys.stderr) if args.serve else contextlib.nullcontext():
+        vectorstore = initialize_vector_db(args.urls, args.persist_dir)
+        print("Website RAG Vector Store is ready.")
+    if args.serve:
+        mcp.run(transport="stdio")
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    main()
@@ -0,0 +1,168 @@
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", "3"))
+RETRIEVER_CANDIDATES = int(os.getenv("RETRIEVER_CANDIDATES", "20"))
+RETRIEVER_RERANK = os.getenv("RETRIEVER_RERANK", "mmr")           # mmr | cross-encoder | none
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+_TOKEN = re.compile(r"[a-z0-9$%]+(?:[.,'][a-z0-9]+)*")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its my of on or our so that the
+their them then there these this to was we what when where which who will with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+# -----------------------------
+#   BM25 INVERTED INDEX
+# -----------------------------
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts, held in memory as an inverted index."""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)       # token -> [(doc index, term frequency)]
+        self.lengths = []
+        for i, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings[token].append((i, tf))
+        n = len(self.lengths)
+        self.avg_length = sum(self.lengths) / n if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, query, k=10):
+        """[(doc index, score)] for the k best matching texts."""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for i, tf in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merge ranked lists of keys; items ranked high in any list come first."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda key: -scores[key])
+
+
+def mmr(query_vector, vectors, k, lambda_mult=0.7):
+    """Indices of `k` vectors picked by maximal marginal relevance (relevant, but not redundant)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(np.linalg.norm(query), 1e-12)
+    relevance = vectors @ query
+    chosen = []
+    while len(chosen) < min(k, len(vectors)):
+        if chosen:
+            redundancy = (vectors @ vectors[chosen].T).max(axis=1)
+        else:
+            redundancy = np.zeros(len(vectors))
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[chosen] = -np.inf
+        chosen.append(int(np.argmax(scores)))
+    return chosen
+
+
+# -----------------------------
+#   HYBRID RETRIEVER
+# -----------------------------
+class HybridRetriever:
+    """
+    Vector search fused with BM25 keyword search, cut down to the few best chunks.
+
+    Both searches return `candidates` chunks; their rankings are merged with
+    reciprocal rank fusion and the fused list is reranked (`mmr`,
+    `cross-encoder`, or `none`) down to `top_k`. The BM25 index is built on
+    first use from every chunk in the collection (`texts`, or the Chroma
+    collection's documents); call refresh() after the collection changes.
+    """
+
+    def __init__(self, vectorstore, texts=None, embeddings=None, top_k=RETRIEVER_TOP_K,
+                 candidates=RETRIEVER_CANDIDATES, rerank=RETRIEVER_RERANK, rrf_k=60, mmr_lambda=0.7):
+        if rerank not in ("mmr", "cross-encoder", "none"):
+            raise ValueError(f"Unknown reranker: {rerank}")
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings or getattr(vectorstore, "embeddings", None)
+        self.top_k = top_k
+        self.candidates = candidates
+        self.rerank = rerank
+        self.rrf_k = rrf_k
+        self.mmr_lambda = mmr_lambda
+        self._texts = list(texts) if texts is not None else None
+        self._texts_given = texts is not None
+        self._bm25 = None
+        self._cross_encoder = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Rebuild the BM25 index (from the collection's current documents) on the next search."""
+        with self._lock:
+            self._bm25 = None
+            if not self._texts_given:
+                self._texts = None
+
+    def _keyword_index(self):
+        with self._lock:
+            if self._bm25 is None:
+                if self._texts is None:
+                    self._texts = self.vectorstore.get(include=["documents"])["documents"]
+                self._bm25 = BM25Index(self._texts)
+            return self._bm25, self._texts
+
+    def _get_cross_encoder(self):
+        if self._cross_encoder is None:
+            from sentence_transformers import CrossEncoder
+            self._cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL)
+        return self._cross_encoder
+
+    def fused(self, query):
+        """Candidate chunk texts in fused (RRF) order, before reranking."""
+        bm25, texts = self._keyword_index()
+        vector_hits = [doc.page_content for doc in self.vectorstore.similarity_search(query, k=self.candidates)]
+        keyword_hits = [texts[i] for i, _ in bm25.search(query, k=self.candidates)]
+        return reciprocal_rank_fusion([vector_hits, keyword_hits], k=self.rrf_k)[:self.candidates]
+
+    def search(self, query):
+        """The `top_k` most useful chunk texts for `query`."""
+        candidates = self.fused(query)
+        if len(candidates) <= self.top_k or self.rerank == "none":
+            return candidates[:self.top_k]
+
+        if self.rerank == "cross-encoder":
+            try:
+                scores = self._get_cross_encoder().predict([(query, text) for text in candidates])
+                order = np.argsort(-np.asarray(scores))
+                return [candidates[i] for i in order[:self.top_k]]
+            except Exception as e:
+                # stdout belongs to the MCP protocol
+                print(f"Cross-encoder unavailable, using MMR: {e}", file=sys.stderr)
+                self.rerank = "mmr"
+
+        if self.embeddings is None:
+            return candidates[:self.top_k]
+        # MMR only weighs embedding similarity, so keep it to the head of the fused list
+        pool = candidates[:self.top_k * 3]
+        chosen = mmr(self.embeddings.embed_query(query), self.embeddings.embed_documents(pool),
+                     self.top_k, self.mmr_lambda)
+        return [pool[i] for i in chosen]
@@ -0,0 +1,212 @@
+"""
+Build or refresh the policy Chroma DB (rag_collection) served by loadPolicy.py.
+
+Pages are read from the PDF one at a time, split into chunks tagged with their
+page and section, embedded in batches and upserted into Chroma. Progress is
+saved to ingest_state.json after every batch, so an interrupted run picks up
+where it stopped, and pages whose text did not change since the last run are
+skipped entirely.
+
+    python ingestPolicy.py                         # home_depot_policy.pdf -> ./chroma_db
+    python ingestPolicy.py new_policy.pdf --rebuild
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "home_depot_policy.pdf")
+PERSIST_DIR = "./chroma_db"             # MUST match loadPolicy.py
+COLLECTION_NAME = "rag_collection"      # MUST match loadPolicy.py
+STATE_FILE = "ingest_state.json"
+BATCH_SIZE = 64
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# "No Lemon Policy:", "Service Plans for Major Appliances:", "Alabama Residents:"
+_HEADING = re.compile(r"^([A-Z][A-Za-z'’/&() -]{2,60}):(?:\s|$)")
+# "STATE VARIATIONS" on a line of its own after a blank line (the exclusions list is in capitals too)
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z /&-]{5,60}$")
+
+
+# -------------------------------------------------------
+#  Extraction
+# -------------------------------------------------------
+def iter_pages(path):
+    """Yield (page number, text) lazily; only one page is held in memory at a time."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def split_sections(text, section):
+    """Split a page into [(section, text)], starting in `section` (carried over from the previous page)."""
+    parts, lines = [], []
+    previous = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        match = _HEADING.match(stripped)
+        heading = match.group(1) if match else None
+        if heading is None and previous == "" and _CAPS_HEADING.match(stripped):
+            heading = stripped
+        if heading:
+            if any(l.strip() for l in lines):
+                parts.append((section, "\n".join(lines)))
+            section, lines = heading.strip(), []
+        lines.append(line)
+        previous = stripped
+    if any(l.strip() for l in lines):
+        parts.append((section, "\n".join(lines)))
+    return parts, section
+
+
+def chunk_page(source, number, text, section, splitter):
+    """Chunks of one page as [(id, text, metadata)] plus the section the page ends in."""
+    chunks = []
+    parts, section = split_sections(text, section)
+    for part_section, part in parts:
+        for doc in splitter.create_documents([part]):
+            chunk_id = hashlib.sha1(f"{source}:{number}:{len(chunks)}:{doc.page_content}".encode("utf-8")).hexdigest()
+            metadata = {"source": source, "page": number, "section": part_section or ""}
+            chunks.append((chunk_id, doc.page_content, metadata))
+    return chunks, section
+
+
+# -------------------------------------------------------
+#  Progress state
+# -------------------------------------------------------
+def load_state(persist_dir):
+    path = os.path.join(persist_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"pages": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(persist_dir, state):
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# -------------------------------------------------------
+#  Ingestion
+# -------------------------------------------------------
+def ingest(vectordb, pdf_path, persist_dir, batch_size=BATCH_SIZE):
+    """
+    Bring `vectordb` in line with the PDF. Returns counters for the run.
+
+    A page is re-chunked only when its text (or the section it starts in)
+    changed; its new chunks are upserted and the chunks it no longer has are
+    deleted. Pages past the end of a shortened document are removed.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    source = os.path.basename(pdf_path)
+    state = load_state(persist_dir)
+    pages = state["pages"]
+    stats = {"pages": 0, "pages_skipped": 0, "chunks_added": 0, "chunks_deleted": 0}
+    pending = []        # [(page key, page hash, chunks)] waiting for the next batch
+
+    if not pages:
+        # A collection built some other way has ids we cannot match; start clean
+        legacy = vectordb.get(include=[])["ids"]
+        if legacy:
+            vectordb.delete(ids=legacy)
+
+    def flush():
+        chunks = [c for _, _, page_chunks in pending for c in page_chunks]
+        if chunks:
+            vectordb.add_texts(
+                texts=[text for _, text, _ in chunks],
+                metadatas=[metadata for _, _, metadata in chunks],
+                ids=[chunk_id for chunk_id, _, _ in chunks]
+            )
+        for key, page_hash, page_chunks in pending:
+            new_ids = [chunk_id for chunk_id, _, _ in page_chunks]
+            keep = set(new_ids)
+            stale = [cid for cid in pages.get(key, {}).get("chunk_ids", []) if cid not in keep]
+            if stale:
+                vectordb.delete(ids=stale)
+            pages[key] = {"hash": page_hash, "chunk_ids": new_ids}
+            stats["chunks_added"] += len(new_ids)
+            stats["chunks_deleted"] += len(stale)
+        state["source"] = source
+        # Only pages written to Chroma are recorded, so a crash just repeats the unsaved batch
+        save_state(persist_dir, state)
+        pending.clear()
+
+    section, last_page = None, 0
+    for number, text in iter_pages(pdf_path):
+        last_page = number
+        stats["pages"] += 1
+        key = str(number)
+        page_hash = hashlib.sha256(f"{source}\0{section}\0{text}".encode("utf-8")).hexdigest()
+        if pages.get(key, {}).get("hash") == page_hash:
+            # Unchanged: no chunking or embedding, but keep track of the section it ends in
+            _, section = split_sections(text, section)
+            stats["pages_skipped"] += 1
+            continue
+
+        chunks, section = chunk_page(source, number, text, section, splitter)
+        pending.append((key, page_hash, chunks))
+        if sum(len(c) for _, _, c in pending) >= batch_size:
+            flush()
+    flush()
+
+    for key in [k for k in pages if int(k) > last_page]:
+        stale = pages.pop(key)["chunk_ids"]
+        if stale:
+            vectordb.delete(ids=stale)
+        stats["chunks_deleted"] += len(stale)
+    save_state(persist_dir, state)
+    return stats
+
+
+def open_collection(persist_dir, embeddings=None):
+    from langchain_community.vectorstores import Chroma
+    from embeddings import get_embeddings
+
+    return Chroma(
+        persist_directory=persist_dir,
+        embedding_function=embeddings or get_embeddings(),
+        collection_name=COLLECTION_NAME
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", default=PDF_PATH, help="policy PDF (default: home_depot_policy.pdf)")
+    parser.add_argument("--persist-dir", default=PERSIST_DIR, help=f"Chroma directory (default: {PERSIST_DIR})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="chunks embedded per batch")
+    parser.add_argument("--rebuild", action="store_true", help="delete the existing DB and ingest from scratch")
+    args = parser.parse_args(argv)
+
+    if args.rebuild and os.path.exists(args.persist_dir):
+        shutil.rmtree(args.persist_dir)
+
+    start = time.perf_counter()
+    vectordb = open_collection(args.persist_dir)
+    stats = ingest(vectordb, args.pdf, args.persist_dir, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {args.pdf} into {args.persist_dir}/{COLLECTION_NAME} in {elapsed:.1f}s: {stats}")
+    embeddings = getattr(vectordb, "embeddings", None)
+    if hasattr(embeddings, "stats"):
+        print(f"Embedding: {embeddings.stats()}")
+
+
+if __name__ == "__main__":
+    main()
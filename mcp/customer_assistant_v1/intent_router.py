@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+
+ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.55"))        # below this: full agent, all tools
+DIRECT_THRESHOLD = float(os.getenv("INTENT_DIRECT_THRESHOLD", "0.8"))         # needed to answer without the agent
+DIRECT_MAX_WORDS = 8        # longer messages ("thanks, and where is my drill?") always reach the agent
+
+# Labelled examples; a message takes the intent of its nearest examples
+INTENT_EXAMPLES = {
+    "greeting": [
+        "hi", "hello", "hey there", "good morning", "hello, anyone there?", "hi, I need some help",
+        "good evening", "hey",
+    ],
+    "thanks": [
+        "thanks", "thank you", "thanks a lot", "thank you so much", "great, thanks", "that helps, thank you",
+        "cheers", "appreciate it",
+    ],
+    "goodbye": [
+        "bye", "goodbye", "see you", "that's all", "nothing else, bye", "have a nice day", "I'm done",
+    ],
+    "customer_id": [
+        "what is my customer ID?", "what's my customer id", "tell me my customer number",
+        "which customer ID am I logged in with?", "do you know my customer ID?",
+    ],
+    "orders": [
+        "where is my order?", "show my orders", "when will my order be delivered?", "list my recent orders",
+        "what is the status of order O001?", "has my order shipped?", "how did I pay for my last order?",
+        "what was the total amount of my order?", "which address is my order going to?",
+        "show my delivered orders",
+    ],
+    "products": [
+        "do you have cordless drills?", "suggest a refrigerator under 50000", "is the lawn mower in stock?",
+        "what is the price of P002?", "show me water heaters", "which products are below 20000?",
+        "tell me about product P001", "what brands of mowers do you sell?", "best rated appliances",
+        "how many units of P004 are available?",
+    ],
+    "policy": [
+        "what is your return policy?", "how do I cancel my protection plan?", "is theft covered?",
+        "what does the warranty cover?", "how do I file a claim?", "is there a deductible?",
+        "can I transfer my plan to someone else?", "how long is a water heater covered?",
+        "what is the refund policy?", "are commercial uses covered?",
+    ],
+    "returns": [
+        "can I return order O001?", "is my order eligible for a refund?", "can I get a replacement for my drill?",
+        "I want to return the fridge I bought", "is it too late to return my last order?",
+        "can I still return order O002?", "my mower broke, can I get it replaced?",
+    ],
+}
+
+# Intents answered without the agent, and the tools each other intent needs
+DIRECT_INTENTS = {"greeting", "thanks", "goodbye", "customer_id"}
+TOOLSETS = {
+    "orders": {"get_customer_orders", "query_snowflake"},
+    "products": {"get_product", "search_products", "query_snowflake"},
+    "policy": {"query_website"},
+    "returns": {"check_return_eligibility", "get_customer_orders", "query_website", "query_snowflake"},
+}
+
+
+def direct_reply(intent, customer_id=None):
+    """Canned answer for a trivial intent, or None if the agent has to answer."""
+    if intent == "greeting":
+        return "Hello! How can I help you today with your orders, our products or our policies?"
+    if intent == "thanks":
+        return "You're welcome! Is there anything else I can help you with?"
+    if intent == "goodbye":
+        return "Thank you for reaching out. Have a great day!"
+    if intent == "customer_id" and customer_id:
+        return f"Your customer ID is {customer_id}."
+    return None
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class IntentRouter:
+    """
+    k-nearest-neighbour intent classifier over embedded labelled examples.
+
+    Runs entirely locally on the shared (cached) embedding model: one query
+    embedding and a matrix product per message. classify() returns None when
+    no intent is a confident match, and the caller should then use every tool.
+    """
+
+    def __init__(self, embeddings, examples=INTENT_EXAMPLES, k=5, threshold=ROUTER_THRESHOLD,
+                 direct_threshold=DIRECT_THRESHOLD):
+        self.embeddings = embeddings
+        self.k = k
+        self.threshold = threshold
+        self.direct_threshold = direct_threshold
+        self.labels = [intent for intent, texts in examples.items() for _ in texts]
+        texts = [text for texts in examples.values() for text in texts]
+        self.vectors = _unit(embeddings.embed_documents(texts))
+
+    def scores(self, text):
+        """{intent: similarity-weighted vote} over the k nearest examples."""
+        similarity = self.vectors @ _unit(self.embeddings.embed_query(text))
+        votes = {}
+        for i in np.argsort(-similarity)[:self.k]:
+            votes[self.labels[i]] = votes.get(self.labels[i], 0.0) + float(similarity[i])
+        return votes, similarity
+
+    def classify(self, text):
+        """(intent or None, similarity of its nearest example)."""
+        votes, similarity = self.scores(text)
+        intent = max(votes, key=votes.get)
+        best = max(float(s) for s, label in zip(similarity, self.labels) if label == intent)
+        if best < self.threshold:
+            return None, best
+        if intent in DIRECT_INTENTS and (best < self.direct_threshold or len(text.split()) > DIRECT_MAX_WORDS):
+            return None, best
+        return intent, best
@@ -1,8 +1,13 @@
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import asyncio
 import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import sys
+import threading
+import time
+
+from semantic_cache import index_version
+from telemetry import span
 
 # -------------------------------------------------------
 #  MCP Server Setup
@@ -13,6 +18,7 @@ load_dotenv()
 
 PERSIST_DIR = "./chroma_db"          # MUST already exist
 COLLECTION_NAME = "rag_collection"      # MUST match your DB
+READY_TIMEOUT = int(os.getenv("POLICY_READY_TIMEOUT", "60"))   # seconds a query waits for the index
 
 
 # -------------------------------------------------------
@@ -22,12 +28,17 @@ def load_vector_db():
     if not os.path.exists(PERSIST_DIR):
         raise FileNotFoundError(
             f"ERROR: No existing Chroma DB found at {PERSIST_DIR}. "
-            "Run your scraper/builder script first."
+            "Build it from the policy PDF first: python ingestPolicy.py"
         )
 
     # print("Loading existing website Chroma DB...")
 
-    embeddings = HuggingFaceEmbeddings()
+    # Heavy imports happen here, off the MCP handshake path
+    from langchain_community.vectorstores import Chroma
+    from embeddings import get_embeddings
+
+    # Shared, cached embeddings: repeated queries skip the model entirely
+    embeddings = get_embeddings()
 
     vectordb = Chroma(
         persist_directory=PERSIST_DIR,
@@ -38,15 +49,44 @@ def load_vector_db():
     return vectordb
 
 
-# Load DB at startup
-vectorstore = load_vector_db()
+# -------------------------------------------------------
+#  Background load: the server answers the MCP handshake and
+#  list_tools right away while the model and index warm up
+# -------------------------------------------------------
+retriever = None
+_ready = threading.Event()
+_load_state = {"error": None, "started": None, "seconds": None, "index_version": None}
+
+
+def _load_index():
+    global retriever
+    from hybrid_retriever import HybridRetriever
+
+    _load_state["started"] = time.monotonic()
+    _load_state["index_version"] = index_version(PERSIST_DIR)
+    try:
+        # BM25 + vector search, reranked down to the few most useful chunks
+        loaded = HybridRetriever(load_vector_db())
+        loaded.search("return policy")      # load the embedding model and build the BM25 index now
+        retriever = loaded
+    except Exception as e:
+        _load_state["error"] = f"{type(e).__name__}: {e}"
+        # stdout carries the MCP protocol
+        print(f"[ERROR] Policy index failed to load: {_load_state['error']}", file=sys.stderr)
+    finally:
+        _load_state["seconds"] = time.monotonic() - _load_state["started"]
+        _ready.set()
+
+
+def start_background_load():
+    threading.Thread(target=_load_index, name="policy-index-loader", daemon=True).start()
 
 
 # -------------------------------------------------------
 #  MCP Tool: Query Website Policies
 # -------------------------------------------------------
 @mcp.tool()
-def query_website(query: str) -> list:
+async def query_website(query: str) -> list:
     """
     Answer the user's question using only internal policy knowledge.
 
@@ -74,13 +114,46 @@ def query_website(query: str) -> list:
     - "I'm unable to provide that information at the moment."
 
     """
+    # Waiting for the index and searching block, so keep them off the server's event loop
+    with span("server:query_website"):
+        return await asyncio.to_thread(_search, query)
 
-    results = vectorstore.similarity_search(query, k=8)
-    return [doc.page_content for doc in results]
+
+def _search(query):
+    if not _ready.wait(READY_TIMEOUT):
+        raise RuntimeError("The policy knowledge base is still loading.")
+    if retriever is None:
+        raise RuntimeError("The policy knowledge base is unavailable.")
+    # ingestPolicy.py rewrote the collection: rebuild BM25 from its current chunks
+    version = index_version(PERSIST_DIR)
+    if version != _load_state["index_version"]:
+        _load_state["index_version"] = version
+        retriever.refresh()
+    with span("chroma_search"):
+        return retriever.search(query)
+
+
+# -------------------------------------------------------
+#  MCP Tool: Readiness probe
+# -------------------------------------------------------
+@mcp.tool()
+def policy_index_status() -> dict:
+    """
+    Internal health check for the service, not for answering customers.
+    Reports whether the policy knowledge base has finished loading.
+    """
+    started = _load_state["started"]
+    return {
+        "ready": _ready.is_set() and retriever is not None,
+        "error": _load_state["error"],
+        "load_seconds": _load_state["seconds"] if _ready.is_set()
+        else (time.monotonic() - started if started else 0.0),
+    }
 
 
 # -------------------------------------------------------
 #  Run MCP Server
 # -------------------------------------------------------
 if __name__ == "__main__":
+    start_background_load()
     mcp.run(transport="stdio")
@@ -0,0 +1,103 @@
+"""
+Load test for the /ask endpoint with a stubbed agent (no LLM or MCP servers).
+
+Each simulated user opens its own session (GET /<customer_id>) and sends
+--requests messages one after another; all users run concurrently against the
+FastAPI app in-process. The stub agent sleeps for --latency seconds to stand
+in for the LLM, so throughput should scale with users up to
+MAX_CONCURRENT_REQUESTS.
+
+    python load_test.py --users 1,5,20,50 --requests 5 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# mcp_client builds its Azure client at import time; give it harmless values.
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
+os.environ.setdefault("API_KEY", "load-test")
+os.environ.setdefault("API_VERSION", "2024-06-01")
+os.environ.setdefault("DEPLOYMENT_ID", "load-test")
+for _header_var in ("SERVICE_LINE", "BRAND", "PROJECT"):
+    os.environ.setdefault(_header_var, "load-test")
+
+import httpx
+
+import fastApi
+
+
+# ==========================================
+# Stub agent: fixed latency, checks isolation
+# ==========================================
+class StubAgent:
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.threads = {}
+
+    async def run(self, user_msg, customer_id=None, thread_id=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            # Messages of one thread must never overlap
+            assert thread_id not in self.threads or not self.threads[thread_id], "thread ran concurrently"
+            self.threads[thread_id] = True
+            await asyncio.sleep(self.latency)
+            return f"{customer_id}:{user_msg}"
+        finally:
+            self.threads[thread_id] = False
+            self.in_flight -= 1
+
+
+async def simulate_user(user, requests):
+    customer_id = f"C{user:04d}"
+    transport = httpx.ASGITransport(app=fastApi.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        (await client.get(f"/{customer_id}")).raise_for_status()
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            res = await client.post("/ask", json={"message": f"msg {i}"})
+            latencies.append(time.perf_counter() - start)
+            res.raise_for_status()
+            # Replies must belong to this user's customer, in order
+            assert res.json()["reply"] == f"{customer_id}:msg {i}", res.json()
+        return latencies
+
+
+async def run_level(users, requests, latency):
+    stub = StubAgent(latency)
+    fastApi.agent = stub
+    # No lifespan events in-process: mark the (stub) agent as initialized
+    fastApi.agent_ready.set()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(simulate_user(u, requests) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(l for user in results for l in user)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return users * requests / elapsed, p95, stub.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1,5,20,50", help="comma-separated simulated user counts")
+    parser.add_argument("--requests", type=int, default=5, help="messages per user")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub agent latency in seconds")
+    args = parser.parse_args()
+
+    print(f"MAX_CONCURRENT_REQUESTS={fastApi.request_slots._value}, stub latency={args.latency}s")
+    print(f"{'users':>6} {'req/s':>8} {'p95 s':>7} {'peak':>5}")
+
+    async def run_all():
+        # One event loop for every level: the app's semaphore binds to the loop it first waits on
+        for users in [int(u) for u in args.users.split(",") if u]:
+            throughput, p95, peak = await run_level(users, args.requests, args.latency)
+            print(f"{users:>6} {throughput:>8.2f} {p95:>7.2f} {peak:>5}")
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
 import os
 import asyncio
+import json
+import time
+import aiosqlite
+import anyio
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
 from langchain_openai import AzureChatOpenAI
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from langchain.agents.middleware import SummarizationMiddleware, wrap_model_call, wrap_tool_call
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.ai import add_usage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from mcp.shared.exceptions import McpError
+
+from intent_router import TOOLSETS, IntentRouter, direct_reply
+from semantic_cache import SemanticCache, index_version
+from telemetry import count_cache, count_intent, count_tokens, observe, sampled, span
 
 import traceback
 
@@ -22,6 +37,57 @@ PROJECT = os.getenv("PROJECT")
 
 print("[INFO] Environment loaded.")
 
+DEFAULT_THREAD_ID = "customer_support_session"
+
+# Conversation memory: SQLite-backed, bounded per thread, expired after inactivity
+MEMORY_DB = os.getenv("MEMORY_DB", "chat_memory.sqlite")
+THREAD_TTL = int(os.getenv("THREAD_TTL", "86400"))                    # seconds without a message
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))  # summarize history beyond this
+HISTORY_KEEP_MESSAGES = int(os.getenv("HISTORY_KEEP_MESSAGES", "10"))  # recent messages kept verbatim
+EVICT_INTERVAL = 300                                                   # seconds between TTL sweeps
+
+# Static system prompt: loaded once and sent byte-identical on every call so the
+# provider can serve it from its prompt cache. Per-customer details go in a
+# short context message after it (see customer_context below).
+SYSTEM_PROMPT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sys_prompt.txt")
+
+
+def load_system_prompt(path=SYSTEM_PROMPT_FILE):
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+SYSTEM_PROMPT = load_system_prompt()
+
+# Semantic cache of policy answers shared by all customers. Only the first turn
+# of a thread (later ones depend on the conversation so far) that used nothing
+# but CACHEABLE_TOOLS (no Snowflake data) is cached, and the cache is emptied
+# whenever the policy Chroma DB at POLICY_DB_DIR is rebuilt.
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "on").lower() != "off"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+POLICY_DB_DIR = "./chroma_db"
+CACHEABLE_TOOLS = {"query_website"}
+# Openings of the "not found" replies the prompts prescribe; a later lookup may do better
+FALLBACK_REPLIES = ("i'm sorry", "i am sorry", "i'm unable", "i am unable", "i don't have", "i do not have")
+
+# Local intent router: trivial messages are answered without the LLM, and the
+# rest run on an agent bound to just the tools their intent needs
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "on").lower() != "off"
+
+# Readiness probes exposed by the MCP servers; used by the service, never given to the LLM
+HEALTH_TOOLS = {"policy_index_status", "snowflake_status"}
+# Tools whose customer_id argument is always set from the logged-in customer
+CUSTOMER_SCOPED_TOOLS = {"query_snowflake", "get_customer_orders", "check_return_eligibility"}
+
+# Seconds a tool call may take before the model is told it failed;
+# override per tool with e.g. TOOL_TIMEOUT_QUERY_SNOWFLAKE=20
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+
+
+def tool_timeout(name):
+    return float(os.getenv(f"TOOL_TIMEOUT_{name.upper()}", TOOL_TIMEOUT))
+
 
 def get_headers(api_key):
     return {
@@ -44,9 +110,31 @@ llm_client = AzureChatOpenAI(
     temperature=0.5,
     top_p=0.7,
     max_retries=3,
+    # Report token usage on streamed responses too
+    stream_usage=True,
 )
 
 
+# ==========================================
+# Token usage per turn
+# ==========================================
+class TurnUsage(BaseCallbackHandler):
+    """Sums usage_metadata over every model call made during one agent turn."""
+
+    def __init__(self):
+        super().__init__()
+        self.usage = None
+        self.calls = 0
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.usage = add_usage(self.usage, usage)
+                    self.calls += 1
+
+
 # ==========================================
 # Main Agent Service
 # ==========================================
@@ -54,8 +142,23 @@ class MCPAgentService:
     def __init__(self):
         self.client = None
         self.tools = {}
-        self.customer_id = None
+        self.health_tools = {}
         self.agent = None
+        self.memory_conn = None
+        self.checkpointer = None
+        self._last_eviction = 0.0
+        self.semantic_cache = None
+        self.router = None
+        self._middleware = []
+        self._agents = {}           # frozenset of tool names -> agent bound to those tools
+        self._sessions_task = None
+        self._sessions_stop = None
+        self._sessions_state = "closed"     # open | reopening | failed
+        self._reopen_task = None
+        # Per-tool call counts and latency, for spotting slow or failing tools
+        self.tool_stats = {}
+        # Running token totals across all turns, for cost/cache monitoring
+        self.usage = {"turns": 0, "model_calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
 
     # -------------------------------------
     async def initialize(self):
@@ -65,224 +168,435 @@ class MCPAgentService:
             "snowflake": {
                 "command": os.path.join(os.getcwd(), ".venv", "Scripts", "python.exe"),
                 "args": [os.path.join(os.getcwd(), "snowflakeServer.py")],
-                "transport": "stdio"
+                "transport": "stdio",
+                # Pass telemetry settings (TRACE_*, PROMETHEUS_MULTIPROC_DIR) through to the servers
+                "env": dict(os.environ)
             },
             "read_web": {
                 "command": os.path.join(os.getcwd(), ".venv", "Scripts", "python.exe"),
                 "args": [os.path.join(os.getcwd(), "loadPolicy.py")],
-                "transport": "stdio"
+                "transport": "stdio",
+                # Pass telemetry settings (TRACE_*, PROMETHEUS_MULTIPROC_DIR) through to the servers
+                "env": dict(os.environ)
             }
         })
 
-        tools_list = await self.client.get_tools()
-        self.tools = {t.name: t for t in tools_list}
+        self._load_tools(await self._open_sessions())
+        self._sessions_state = "open"
 
         print("[INFO] Tools loaded:", list(self.tools.keys()))
 
         # -------------------------------------------------------
-        # CREATE AGENT WITH LLM + TOOLS + MEMORY (NEW)
+        # PERSISTENT MEMORY (SQLite checkpoints + thread activity for TTL)
         # -------------------------------------------------------
-        self.agent = create_agent(
-            llm_client,
-            list(self.tools.values()),
-            checkpointer=InMemorySaver()  # <-- integrated memory
+        self.memory_conn = await aiosqlite.connect(MEMORY_DB)
+        self.checkpointer = AsyncSqliteSaver(self.memory_conn)
+        await self.checkpointer.setup()
+        await self.memory_conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
         )
+        await self.memory_conn.commit()
+
+        # Customer details follow the static system prompt as a small message of
+        # their own, added per model call and never stored in the history
+        @wrap_model_call
+        async def customer_context(request, handler):
+            customer_id = (request.runtime.context or {}).get("customer_id")
+            if customer_id:
+                context = SystemMessage(content=self._customer_context(customer_id))
+                request = request.override(messages=[context, *request.messages])
+            return await handler(request)
+
+        @wrap_model_call
+        async def trace_model(request, handler):
+            with span("llm", messages=len(request.messages)):
+                return await handler(request)
+
+        # The SQL guard scopes ORDERS to the customer passed here, so it comes from
+        # the request context and whatever the model put in the call is replaced
+        @wrap_tool_call
+        async def scope_customer(request, handler):
+            if request.tool_call["name"] in CUSTOMER_SCOPED_TOOLS:
+                customer_id = (request.runtime.context or {}).get("customer_id") or ""
+                args = {**request.tool_call["args"], "customer_id": customer_id}
+                request = request.override(tool_call={**request.tool_call, "args": args})
+            return await handler(request)
+
+        # Tool calls the model makes in one step run concurrently (one task each),
+        # so a turn takes as long as its slowest tool; a stuck call is cut off
+        @wrap_tool_call
+        async def time_tool(request, handler):
+            name = request.tool_call["name"]
+            start = time.perf_counter()
+            try:
+                # Round trip over the stdio session; the server records its own share as server:<tool>
+                with span(f"tool:{name}"):
+                    result = await asyncio.wait_for(handler(request), tool_timeout(name))
+                outcome = "error" if getattr(result, "status", None) == "error" else "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                result = ToolMessage(
+                    content=f"{name} did not respond within {tool_timeout(name):.0f}s.",
+                    name=name,
+                    tool_call_id=request.tool_call["id"],
+                    status="error"
+                )
+            except Exception as e:
+                # The server behind this session died: restart it for later calls
+                if not self._session_lost(e):
+                    raise
+                outcome = "error"
+                self._reopen_sessions_soon()
+                result = ToolMessage(
+                    content=f"{name} is temporarily unavailable.",
+                    name=name,
+                    tool_call_id=request.tool_call["id"],
+                    status="error"
+                )
+            self._record_tool(name, outcome, time.perf_counter() - start)
+            return result
+
+        self._middleware = [
+            customer_context,
+            trace_model,
+            scope_customer,
+            time_tool,
+            # Older turns are folded into a summary once history exceeds the budget
+            SummarizationMiddleware(
+                llm_client,
+                trigger=("tokens", HISTORY_TOKEN_BUDGET),
+                keep=("messages", HISTORY_KEEP_MESSAGES)
+            ),
+        ]
+
+        # -------------------------------------------------------
+        # CREATE AGENT WITH LLM + TOOLS + MEMORY
+        # -------------------------------------------------------
+        self.agent = self._agent_for(None)
 
         print("[INFO] LangChain Agent initialized with memory.")
 
+        if SEMANTIC_CACHE:
+            self.semantic_cache = await asyncio.to_thread(self._build_semantic_cache)
+        if INTENT_ROUTER:
+            self.router = await asyncio.to_thread(self._build_router)
+
     # ------------------------------
-    async def run(self, user_msg,customer_id=None):
-        self.customer_id = customer_id
-        print(f"[INFO] Active Customer ID set to: {self.customer_id}")
-        # System prompt
-        system_prompt = f"""
-                    You are an AI assistant with access to tools (Snowflake and ChromaDB). 
-                    You help customers with queries related to:
-                    - Products  
-                    - Orders  
-                    - Payments  
-                    - Inventory & stock  
-                    - Shipping & delivery  
-                    - Policies (return, refund, replacement, warranty)  
-                    - Account-related questions  
-
-                    Always match your actions to the user’s intent and only use tools when necessary.
-                    always use the CUSTOMER_ID = {self.customer_id} for all queries. and never ask for customer id from user.
-
-                    ============================================================================
-                    CUSTOMER ID RULE
-                    ============================================================================
-                    - The logged-in customer ID is ALWAYS known from the system.  
-                    - NEVER ask the user again for their customer ID.  
-                    - ALWAYS apply:  ORDERS.CUSTOMER_ID = {self.customer_id}  
-                    - If the customer asks: "What is my customer ID?" → respond with the actual ID.
-
-                    ============================================================================
-                    FORMATTING RULES (VERY IMPORTANT)
-                    ============================================================================
-                    All answers must be:
-                    - Clear, concise, factual  
-                    - Structured with spacing  
-                    - Easy to read  
-                    - Not technical  
-
-                    When listing multiple results:
-                    1. Use a numbered list for **steps or sequences**.
-                    2. For each item in a list (example: multiple orders), format like this:
-
-                    <Number>. **Order ID: O001**  
-                    - **Product ID:** P001  
-                    - **Order Date:** January 2, 2025  
-                    - **Delivered On:** January 6, 2025  
-                    - **Status:** Delivered  
-                    - **Payment Method:** Credit Card  
-                    - **Shipping Address:** 123 Main St, Mumbai  
-                    - **Total Amount:** ₹34,999.00  
-
-                    3. Put a line break between items.
-                    4. NEVER return raw JSON or raw tool outputs—always convert to natural text.
-
-                    ============================================================================
-                    PRODUCT VALIDATION RULE
-                    ============================================================================
-                    If user gives BOTH product name + product ID:
-                    1. Validate that PRODUCT_ID belongs to that name.
-                    2. If mismatch → “The product name and product ID do not match in our records.”
-                    3. If correct → proceed with order/policy lookup.
-
-                    ============================================================================
-                    GENERAL BEHAVIOR
-                    ============================================================================
-                    - Product queries → use product tool  
-                    - Order queries → use orders tool  
-                    - Payment queries → use payment info  
-                    - Shipping queries → use delivery status  
-                    - Policies → respond using ChromaDB  
-                    - Only call tools when required.
-
-                    ============================================================================
-                    TOOL USAGE RULES
-                    ============================================================================
-                    - Use tools ONLY when required.
-                    - Never guess values that come from Snowflake or Chroma.
-                    - If identifiers are missing → ask for the missing value.
-                    - If tool response is incomplete → ask user for additional details.
-                    - Never mention internal errors. Use:
-                    “I'm sorry, I don't have that information available.”
-                    “I'm unable to provide that right now.”
-
-                    ============================================================================
-                    PRODUCT SUGGESTION RULES
-                    ============================================================================
-                    If user gives a budget:
-                    1. Query PRODUCTS/INVENTORY for items within budget.
-                    2. Respond with:
-                    - name  
-                    - brand  
-                    - price  
-                    - (optional) rating  
-                    3. If no matches → tell user to adjust budget.
-                    4. If tool fails → return a generic polite error.
-
-                    ============================================================================
-                    KNOWLEDGE RESTRICTION
-                    ============================================================================
-                    Allowed sources:
-                    1. Snowflake  
-                    2. ChromaDB  
-
-                    NOT allowed:
-                    - Pretrained outside knowledge  
-                    - Guessing missing attributes  
-                    - Infer features not in database  
-
-                    If missing:
-                    “I'm sorry, but I could not find any matching products in our catalog.”
-
-                    ============================================================================
-                    STRICT SQL COLUMN RULES — ORDERS TABLE
-                    ============================================================================
-                    Allowed columns ONLY:
-                    - ORDER_ID  
-                    - CUSTOMER_ID  
-                    - PRODUCT_ID  
-                    - ORDER_DATE  
-                    - DELIVERY_DATE  
-                    - STATUS  
-                    - PAYMENT_METHOD  
-                    - SHIPPING_ADDRESS  
-                    - TOTAL_AMOUNT  
-                    - CREATED_AT  
-
-                    Rules:
-                    - Do NOT reference columns outside this list.
-                    - Never invent fields.
-                    - If user asks for a missing field → respond that it doesn't exist.
-                    - Allowed JOIN keys:
-                    - CUSTOMERS.CUSTOMER_ID  
-                    - PRODUCTS.PRODUCT_ID  
-
-                    ============================================================================
-                    STRICT SQL COLUMN RULES — PRODUCTS TABLE
-                    ============================================================================
-                    Allowed columns ONLY:
-                    - PRODUCT_ID  
-                    - NAME  
-                    - BRAND  
-                    - CATEGORY  
-                    - SUB_CATEGORY  
-                    - DESCRIPTION  
-                    - SPECIFICATIONS  
-                    - PRICE  
-                    - RATING  
-                    - CREATED_AT  
-
-                    Rules:
-                    - No invented fields  
-                    - No outside attributes  
-                    - Allowed JOIN keys:
-                    - PRODUCTS.PRODUCT_ID  
-                    - INVENTORY.PRODUCT_ID  
-                    - ORDERS.PRODUCT_ID  
-                    - CUSTOMERS.CUSTOMER_ID  
-
-                    ============================================================================
-                    RETURN / REFUND / REPLACEMENT (MUST FOLLOW)
-                    ============================================================================
-                    When user asks for eligibility:
-                    1. Query Snowflake → get ORDER_DATE, DELIVERY_DATE, PRODUCT_ID  
-                    2. Query Chroma → get return/refund policy  
-                    3. Combine results:
-                    - calculate days since delivery  
-                    - check policy window  
-                    - provide final eligibility  
-
-                    Do NOT:
-                    - Guess dates or policies  
-                    - Answer without tool usage  
-
-                    If Snowflake missing →  
-                    “I'm sorry, I don't have that order information available.”
-
-                    If policy missing →  
-                    “I'm sorry, I could not find the return or refund policy for this product.”
-
-
-
-                """
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_msg}
-        ]
+    @staticmethod
+    def _build_semantic_cache():
+        try:
+            # Same (cached) embedding model as the policy vector store (loadPolicy.py)
+            from embeddings import get_embeddings
+            embeddings = get_embeddings()
+        except Exception as e:
+            print("[WARN] Semantic cache disabled:", str(e))
+            return None
+        print("[INFO] Semantic response cache enabled.")
+        return SemanticCache(
+            embeddings.embed_query,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL,
+            version=lambda: index_version(POLICY_DB_DIR)
+        )
 
+    @staticmethod
+    def _build_router():
+        try:
+            from embeddings import get_embeddings
+            router = IntentRouter(get_embeddings())
+        except Exception as e:
+            print("[WARN] Intent router disabled:", str(e))
+            return None
+        print("[INFO] Intent router enabled.")
+        return router
+
+    def _agent_for(self, intent):
+        """
+        The agent for an intent: bound to its TOOLSETS entry, or to every tool
+        when the intent is unknown. Agents are built once per tool set and share
+        the checkpointer, so a thread keeps its history whichever one answers.
+        """
+        names = TOOLSETS.get(intent, set()) & set(self.tools) or set(self.tools)
+        key = frozenset(names)
+        if key not in self._agents:
+            self._agents[key] = create_agent(
+                llm_client,
+                [tool for name, tool in self.tools.items() if name in names],
+                system_prompt=SYSTEM_PROMPT,
+                middleware=self._middleware,
+                checkpointer=self.checkpointer
+            )
+        return self._agents[key]
+
+    async def _route(self, user_msg):
+        if self.router is None:
+            return None
+        with span("route"):
+            intent, similarity = await asyncio.to_thread(self.router.classify, user_msg)
+        count_intent(intent)
+        print(f"[INFO] Intent {intent or 'general'} (similarity {similarity:.2f}).")
+        return intent
+
+    # ------------------------------
+    async def readiness(self):
+        """Agent state plus each MCP server's own readiness probe."""
+        status = {"agent": self.agent is not None, "sessions": self._sessions_state, "servers": {},
+                  "tools": self.tool_stats}
+        for name, tool in self.health_tools.items():
+            try:
+                status["servers"][name] = self._tool_json(await asyncio.wait_for(tool.ainvoke({}), tool_timeout(name)))
+            except Exception as e:
+                status["servers"][name] = {"ready": False, "error": str(e) or type(e).__name__}
+                if self._session_lost(e):
+                    # Every session is being reopened; the others can't answer until then
+                    self._reopen_sessions_soon()
+                    status["sessions"] = self._sessions_state
+                    break
+        return status
+
+    @staticmethod
+    def _tool_json(result):
+        # MCP tools come back as text (or text content blocks) holding the JSON result
+        if isinstance(result, list):
+            result = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in result)
         try:
-            result = await self.agent.ainvoke({"messages": messages},
-                                            config={"configurable": {"thread_id": "customer_support_session"}}
-                                            )
+            return json.loads(result) if isinstance(result, str) else result
+        except ValueError:
+            return {"raw": result}
+
+    # ------------------------------
+    async def _open_sessions(self):
+        """
+        Start one MCP session per server and load its tools bound to it.
+
+        Tool calls then reuse these sessions (concurrent calls are multiplexed
+        over them) instead of spawning a server process per call. The sessions
+        live in their own task, since stdio sessions must be closed by the task
+        that opened them; aclose() ends it.
+        """
+        loaded = asyncio.get_running_loop().create_future()
+        self._sessions_stop = asyncio.Event()
+
+        async def hold_sessions():
+            try:
+                async with AsyncExitStack() as stack:
+                    tools = []
+                    for name in self.client.connections:
+                        session = await stack.enter_async_context(self.client.session(name))
+                        tools += await load_mcp_tools(session, server_name=name)
+                    loaded.set_result(tools)
+                    await self._sessions_stop.wait()
+            except Exception as e:
+                if not loaded.done():
+                    loaded.set_exception(e)
+                else:
+                    print(f"[WARN] MCP sessions closed with an error: {e}")
+
+        self._sessions_task = asyncio.create_task(hold_sessions())
+        return await loaded
+
+    async def _close_sessions(self):
+        if self._sessions_task is not None:
+            self._sessions_stop.set()
+            await self._sessions_task
+            self._sessions_task = None
+
+    def _load_tools(self, tools_list):
+        self.tools = {t.name: t for t in tools_list if t.name not in HEALTH_TOOLS}
+        self.health_tools = {t.name: t for t in tools_list if t.name in HEALTH_TOOLS}
+
+    @staticmethod
+    def _session_lost(error):
+        """True for the errors a tool call raises once its server's stdio session has closed."""
+        if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError)):
+            return True
+        return isinstance(error, McpError) and "Connection closed" in str(error)
+
+    def _reopen_sessions_soon(self):
+        """Reopen the MCP sessions in the background, unless that is already under way."""
+        if self._reopen_task is None or self._reopen_task.done():
+            self._sessions_state = "reopening"
+            self._reopen_task = asyncio.create_task(self._reopen_sessions())
+
+    async def _reopen_sessions(self):
+        """
+        Restart the MCP servers after one died: new sessions, their tools, and
+        agents rebuilt on them. Turns already running finish on the old agents.
+        If the servers do not come back, the state stays "failed" (/ready
+        answers 503) and the next lost call tries again.
+        """
+        print("[WARN] An MCP session closed; restarting the MCP servers.")
+        await self._close_sessions()
+        try:
+            self._load_tools(await self._open_sessions())
+        except Exception as e:
+            self._sessions_state = "failed"
+            print("[ERROR] Could not reopen the MCP sessions:", str(e))
+            return
+        self._agents = {}
+        self.agent = self._agent_for(None)
+        self._sessions_state = "open"
+        print("[INFO] MCP sessions reopened. Tools:", list(self.tools.keys()))
+
+    def _record_tool(self, name, outcome, seconds):
+        stats = self.tool_stats.setdefault(name, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = seconds * 1000
+        stats["calls"] += 1
+        stats["errors"] += outcome == "error"
+        stats["timeouts"] += outcome == "timeout"
+        stats["total_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+        print(f"[TOOL] {name} {outcome} in {ms:.0f}ms")
+
+    async def aclose(self):
+        if self._reopen_task is not None and not self._reopen_task.done():
+            await self._reopen_task
+        await self._close_sessions()
+        self._sessions_state = "closed"
+        if self.memory_conn is not None:
+            await self.memory_conn.close()
+            self.memory_conn = None
+
+    # ------------------------------
+    async def _touch_thread(self, thread_id):
+        """Record activity on a thread and drop threads idle longer than THREAD_TTL."""
+        now = time.time()
+        await self.memory_conn.execute(
+            "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+            (thread_id, now)
+        )
+        await self.memory_conn.commit()
+
+        if now - self._last_eviction < EVICT_INTERVAL:
+            return
+        self._last_eviction = now
+        cursor = await self.memory_conn.execute(
+            "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (now - THREAD_TTL,)
+        )
+        expired = [row[0] for row in await cursor.fetchall()]
+        for tid in expired:
+            await self.checkpointer.adelete_thread(tid)
+        if expired:
+            await self.memory_conn.executemany(
+                "DELETE FROM thread_activity WHERE thread_id = ?", [(tid,) for tid in expired]
+            )
+            await self.memory_conn.commit()
+            print(f"[INFO] Evicted {len(expired)} expired conversation threads.")
+
+    # ------------------------------
+    @staticmethod
+    def _customer_context(customer_id):
+        return (
+            f"Customer context: the logged-in customer's CUSTOMER_ID is {customer_id}. "
+            f"Apply ORDERS.CUSTOMER_ID = '{customer_id}' to every order query."
+        )
+
+    # ------------------------------
+    def _record_usage(self, thread_id, turn):
+        """Log this turn's token counts and add them to the running totals."""
+        usage = turn.usage or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        prompt = usage.get("input_tokens", 0)
+        self.usage["turns"] += 1
+        self.usage["model_calls"] += turn.calls
+        self.usage["input_tokens"] += prompt
+        self.usage["output_tokens"] += usage.get("output_tokens", 0)
+        self.usage["cached_tokens"] += cached
+        count_tokens(prompt, usage.get("output_tokens", 0), cached)
+        hit_rate = cached / prompt if prompt else 0.0
+        print(f"[USAGE] thread={thread_id} calls={turn.calls} prompt={prompt} "
+              f"completion={usage.get('output_tokens', 0)} cached={cached} ({hit_rate:.0%})")
+
+    # ------------------------------
+    async def _standalone(self, config):
+        """
+        True when the thread has no history yet. Only such messages go through the
+        semantic cache: a follow-up like "what about appliances?" means something
+        different in every conversation.
+        """
+        if self.semantic_cache is None:
+            return False
+        state = await self.agent.aget_state(config)
+        return not state.values.get("messages")
+
+    async def _cached_answer(self, user_msg, customer_id, config):
+        """Answer from the semantic cache, recording the exchange in the thread's history."""
+        if self.semantic_cache is None or (customer_id and customer_id in user_msg):
+            return None
+        with span("semantic_cache"):
+            answer, similarity = await asyncio.to_thread(self.semantic_cache.lookup, user_msg)
+        count_cache("semantic", answer is not None)
+        if answer is None:
+            return None
+        print(f"[INFO] Semantic cache hit (similarity {similarity:.3f}).")
+        await self._record_exchange(config, user_msg, answer)
+        return answer
+
+    async def _record_exchange(self, config, user_msg, answer):
+        """Add a turn answered without the agent to the thread's history."""
+        await self.agent.aupdate_state(
+            config, {"messages": [HumanMessage(content=user_msg), AIMessage(content=answer)]}, as_node="model"
+        )
+
+    async def _direct_answer(self, intent, user_msg, customer_id, config):
+        answer = direct_reply(intent, customer_id)
+        if answer is not None:
+            await self._record_exchange(config, user_msg, answer)
+        return answer
+
+    async def _cache_answer(self, user_msg, answer, tools_used, customer_id):
+        # Policy lookups only: anything from Snowflake, or no lookup at all, may be customer-specific
+        if self.semantic_cache is None or not tools_used or not tools_used <= CACHEABLE_TOOLS:
+            return
+        if customer_id and (customer_id in user_msg or customer_id in answer):
+            return
+        if answer.strip().replace("\u2019", "'").lower().startswith(FALLBACK_REPLIES):
+            return
+        await asyncio.to_thread(self.semantic_cache.store, user_msg, answer)
+
+    @staticmethod
+    def _turn_tools(messages):
+        """Names of the tools called since the last user message."""
+        tools = set()
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, ToolMessage):
+                tools.add(message.name)
+        return tools
+
+    # ------------------------------
+    async def run(self, user_msg, customer_id=None, thread_id=DEFAULT_THREAD_ID):
+        # customer_id/thread_id are per call so concurrent sessions never share state
+        print(f"[INFO] Run for customer {customer_id} on thread {thread_id}")
+        messages = [{"role": "user", "content": user_msg}]
+
+        config = {"configurable": {"thread_id": thread_id}}
+        turn = TurnUsage()
+
+        try:
+            await self._touch_thread(thread_id)
+            intent = await self._route(user_msg)
+            direct = await self._direct_answer(intent, user_msg, customer_id, config)
+            if direct is not None:
+                return direct
+            standalone = await self._standalone(config)
+            cached = await self._cached_answer(user_msg, customer_id, config) if standalone else None
+            if cached is not None:
+                return cached
+
+            with span("agent", thread_id=thread_id, intent=intent or "general"):
+                result = await self._agent_for(intent).ainvoke({"messages": messages},
+                                                               config={**config, "callbacks": [turn]},
+                                                               context={"customer_id": customer_id}
+                                                               )
             print("[INFO] Agent run complete.")
-            print("[DEBUG] Full result:", result)
+            self._record_usage(thread_id, turn)
+            if sampled():
+                print(f"[DEBUG] Thread {thread_id} holds {len(result['messages'])} messages after this turn.")
             final_msg = result["messages"][-1].content
+            if standalone:
+                await self._cache_answer(user_msg, final_msg, self._turn_tools(result["messages"]), customer_id)
 
             # LangChain memory automatically stores:
             # user → assistant messages
@@ -294,6 +608,66 @@ class MCPAgentService:
             print(traceback.format_exc())
             return "Something went wrong. Please try again."
 
+    # ------------------------------
+    async def stream(self, user_msg, customer_id=None, thread_id=DEFAULT_THREAD_ID):
+        """
+        Same agent loop as run(), yielded as events while it happens:
+          {"type": "token", "text": ...}        LLM output as it is generated
+          {"type": "tool_start", "name": ...}   a tool call started
+          {"type": "tool_end", "name": ...}     a tool call finished
+          {"type": "done", "reply": ...}        final answer (authoritative text)
+          {"type": "error", "message": ...}
+        """
+        print(f"[INFO] Streaming run for customer {customer_id} on thread {thread_id}")
+        messages = [{"role": "user", "content": user_msg}]
+        config = {"configurable": {"thread_id": thread_id}}
+        turn = TurnUsage()
+        tools_used = set()
+
+        try:
+            await self._touch_thread(thread_id)
+            intent = await self._route(user_msg)
+            answer = await self._direct_answer(intent, user_msg, customer_id, config)
+            standalone = answer is None and await self._standalone(config)
+            if standalone:
+                answer = await self._cached_answer(user_msg, customer_id, config)
+            if answer is not None:
+                yield {"type": "done", "reply": answer}
+                return
+
+            agent = self._agent_for(intent)
+            # Timed by hand: a span context can't stay open across the yields below
+            start = time.perf_counter()
+            async for event in agent.astream_events({"messages": messages},
+                                                         config={**config, "callbacks": [turn]},
+                                                         context={"customer_id": customer_id}, version="v2"):
+                kind = event["event"]
+                # Only the agent's own model node; SummarizationMiddleware's LLM call
+                # (in its before_model node) streams too, but must not reach the customer
+                if kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "model":
+                    text = event["data"]["chunk"].content
+                    if isinstance(text, str) and text:
+                        yield {"type": "token", "text": text}
+                elif kind == "on_tool_start":
+                    tools_used.add(event["name"])
+                    yield {"type": "tool_start", "name": event["name"]}
+                elif kind == "on_tool_end":
+                    yield {"type": "tool_end", "name": event["name"]}
+
+            state = await agent.aget_state(config)
+            observe("agent", time.perf_counter() - start)
+            print("[INFO] Agent stream complete.")
+            self._record_usage(thread_id, turn)
+            reply = state.values["messages"][-1].content
+            if standalone:
+                await self._cache_answer(user_msg, reply, tools_used, customer_id)
+            yield {"type": "done", "reply": reply}
+
+        except Exception as e:
+            print("\n[ERROR INTERNAL]:", str(e))
+            print(traceback.format_exc())
+            yield {"type": "error", "message": "Something went wrong. Please try again."}
+
 
 # --------------------------------------------------------
 # CLI LOOP
@@ -314,4 +688,6 @@ if __name__ == "__main__":
             response = await agent.run(msg)
             print("Assistant:", response, "\n")
 
+        await agent.aclose()
+
     asyncio.run(main())
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def index_version(persist_dir):
+    """
+    Fingerprint of a persisted Chroma collection. It changes whenever the
+    collection is rebuilt, which invalidates answers cached against the old one.
+    """
+    path = os.path.join(persist_dir, "chroma.sqlite3")
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+# -----------------------------
+#   SEMANTIC RESPONSE CACHE
+# -----------------------------
+class SemanticCache:
+    """
+    Caches agent answers by question meaning rather than exact text.
+
+    `embed` turns a question into a vector (e.g. get_embeddings().embed_query).
+    A lookup returns the answer of the most similar cached question when its
+    cosine similarity is at least `threshold` and it is younger than `ttl`
+    seconds. `version` is a zero-argument callable; when its value changes
+    (the policy collection was rebuilt) every entry is dropped.
+
+    Only store answers that hold no customer-specific data; deciding that is
+    up to the caller.
+    """
+
+    def __init__(self, embed, threshold=0.92, ttl=3600, max_entries=1000, version=None):
+        self._embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._version = version or (lambda: None)
+        self._current_version = self._version()
+        self._questions = []     # normalized question text, aligned with rows of _vectors
+        self._answers = []
+        self._expires = []
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._lookup_seconds = 0.0
+
+    def _vector(self, question):
+        vec = np.asarray(self._embed(_normalize(question)), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _check_version(self):
+        version = self._version()
+        if version != self._current_version:
+            self._current_version = version
+            self._clear()
+            self.invalidations += 1
+
+    def lookup(self, question):
+        """Return (answer, similarity) for a close enough cached question, else (None, similarity)."""
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self._check_version()
+                self._expire()
+                if not self._answers:
+                    self.misses += 1
+                    return None, 0.0
+                normalized = _normalize(question)
+                if normalized in self._questions:
+                    # Exact repeat: skip the embedding call altogether
+                    self.hits += 1
+                    return self._answers[self._questions.index(normalized)], 1.0
+                vectors = self._vectors
+
+            scores = vectors @ self._vector(question)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+
+            with self._lock:
+                if similarity >= self.threshold and best < len(self._answers) \
+                        and self._vectors is vectors:
+                    self.hits += 1
+                    return self._answers[best], similarity
+                self.misses += 1
+                return None, similarity
+        finally:
+            self._lookup_seconds += time.perf_counter() - start
+
+    def store(self, question, answer):
+        vec = self._vector(question)
+        with self._lock:
+            self._check_version()
+            normalized = _normalize(question)
+            if normalized in self._questions:
+                self._remove(self._questions.index(normalized))
+            if len(self._answers) >= self.max_entries:
+                # Oldest entries expire first
+                self._remove(int(np.argmin(self._expires)))
+            self._questions.append(normalized)
+            self._answers.append(answer)
+            self._expires.append(time.monotonic() + self.ttl)
+            self._vectors = vec[None, :] if not self._vectors.size else np.vstack([self._vectors, vec])
+            self.stores += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for i in reversed(range(len(self._expires))):
+            if self._expires[i] <= now:
+                self._remove(i)
+
+    def _remove(self, i):
+        del self._questions[i], self._answers[i], self._expires[i]
+        self._vectors = np.delete(self._vectors, i, axis=0)
+
+    def _clear(self):
+        self._questions, self._answers, self._expires = [], [], []
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._answers),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "avg_lookup_ms": 1000 * self._lookup_seconds / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,63 @@
+import asyncio
+import secrets
+import time
+import uuid
+
+SESSION_COOKIE = "session_id"
+
+
+# ==========================================
+# Per-browser chat session
+# ==========================================
+class Session:
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        # Conversation memory is keyed by thread_id, so each session gets its own
+        self.thread_id = f"{customer_id}-{uuid.uuid4().hex}"
+        # Serializes this session's messages so replies come back in order
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """
+    Maps the session cookie to the customer it was opened for.
+    Sessions idle for longer than `ttl` seconds are dropped.
+    """
+
+    def __init__(self, ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+
+    def start(self, session_id, customer_id):
+        """Return (session_id, session) for this browser, opening a new one if needed."""
+        self._evict()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or session.customer_id != customer_id:
+            # New browser, expired session, or a different customer: fresh conversation
+            session_id = secrets.token_urlsafe(24)
+            session = Session(customer_id)
+            self._sessions[session_id] = session
+        session.last_seen = time.monotonic()
+        return session_id, session
+
+    def get(self, session_id):
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or time.monotonic() - session.last_seen > self.ttl:
+            return None
+        session.last_seen = time.monotonic()
+        return session
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_seen > self.ttl]
+        for sid in expired:
+            del self._sessions[sid]
+        if len(self._sessions) >= self.max_sessions:
+            oldest = sorted(self._sessions, key=lambda sid: self._sessions[sid].last_seen)
+            for sid in oldest[:len(self._sessions) - self.max_sessions + 1]:
+                del self._sessions[sid]
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# -----------------------------
+#   CONNECTION POOL
+# -----------------------------
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections.
+
+    `connect` is any zero-argument factory (snowflake.connector.connect, or the
+    SQLite stand-in in fakeSnowflake.py). Idle connections are closed after
+    `idle_timeout` seconds and re-validated with SELECT 1 when they have been
+    idle longer than `health_check_after` seconds.
+    """
+
+    def __init__(self, connect, max_size=4, idle_timeout=300, health_check_after=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._idle = []            # [(conn, last_used)], most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No database connection available")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.health_check_after \
+                    and not self.is_healthy(conn):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                self.created += 1
+            else:
+                self.reused += 1
+            return conn
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        with self._cond:
+            self._in_use -= 1
+            if broken:
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            # A failed statement usually leaves the session usable; only drop it if it is not.
+            broken = not self.is_healthy(conn)
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    @staticmethod
+    def is_healthy(conn):
+        try:
+            if getattr(conn, "is_closed", None) and conn.is_closed():
+                return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                self._close(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            return {"idle": len(self._idle), "in_use": self._in_use,
+                    "created": self.created, "reused": self.reused}
+
+
+# -----------------------------
+#   QUERY RESULT CACHE
+# -----------------------------
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b")
+_ORDERS = re.compile(r"\bORDERS\b")
+_CUSTOMER_FILTER = re.compile(r"\bCUSTOMER_ID\s*=\s*('(?:[^']|'')*'|\w+|\?)")
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and upper-case everything outside quoted literals/identifiers."""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    out = []
+    for i, part in enumerate(parts):
+        out.append(part if i % 2 else " ".join(part.split()).upper())
+    return "".join(out)
+
+
+class QueryCache:
+    """
+    TTL cache of read-only query results keyed on normalized SQL (plus its
+    bound parameters, if any).
+
+    Queries touching ORDERS are only cached when they filter on a single
+    CUSTOMER_ID (a literal or a bound ?), are stored under that customer's
+    scope and expire sooner, since order status changes more often than the
+    catalogue or policies.
+    """
+
+    def __init__(self, ttl=300, orders_ttl=60, max_entries=512):
+        self.ttl = ttl
+        self.orders_ttl = orders_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, rows)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, sql, params=()):
+        """(cache key, ttl) for a query, or (None, None) if it must not be cached."""
+        text = normalize_sql(sql)
+        normalized = (text, tuple(params)) if params else text
+        if not _READ_ONLY.match(text):
+            return None, None
+        if _ORDERS.search(text):
+            customers = set(_CUSTOMER_FILTER.findall(text))
+            if len(customers) != 1:
+                return None, None
+            return ("customer", customers.pop(), normalized), self.orders_ttl
+        return ("shared", normalized), self.ttl
+
+    def get(self, sql, params=()):
+        key, _ = self._key(sql, params)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, sql, rows, params=()):
+        key, ttl = self._key(sql, params)
+        if key is None or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -1,7 +1,16 @@
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import asyncio
+import datetime
 import os
-import snowflake.connector
+import sys
+import threading
+import time
+import uuid
+
+from snowflakePool import ConnectionPool, QueryCache
+from sql_guard import SQLGuardError, check_cost, guard_sql
+from telemetry import count_cache, span
 
 # Create MCP server instance
 mcp = FastMCP(name="snowflake_mcp_server")
@@ -16,50 +25,427 @@ DATABASE = os.getenv("SNOWFLAKE_DATABASE")
 SCHEMA = os.getenv("SNOWFLAKE_SCHEMA")
 WAREHOUSE = os.getenv("SNOWFLAKE_WAREHOUSE")
 
+# Pool / cache tuning
+POOL_SIZE = int(os.getenv("SNOWFLAKE_POOL_SIZE", "4"))
+POOL_IDLE_TIMEOUT = int(os.getenv("SNOWFLAKE_POOL_IDLE_TIMEOUT", "300"))      # seconds
+CACHE_TTL = int(os.getenv("SNOWFLAKE_CACHE_TTL", "300"))                      # catalogue / policy queries
+ORDERS_CACHE_TTL = int(os.getenv("SNOWFLAKE_ORDERS_CACHE_TTL", "60"))         # per-customer ORDERS queries
+
+# Result size limits: rows per page, rows per query, and how long an unfinished
+# result set stays open for a follow-up page request
+PAGE_SIZE = int(os.getenv("SNOWFLAKE_PAGE_SIZE", "50"))
+MAX_ROWS = int(os.getenv("SNOWFLAKE_MAX_ROWS", "500"))
+CURSOR_TTL = int(os.getenv("SNOWFLAKE_CURSOR_TTL", "120"))                    # seconds
+MAX_OPEN_CURSORS = max(1, POOL_SIZE // 2)
+
+# Point at a SQLite file (see fakeSnowflake.py) to run without a Snowflake account
+FAKE_DB = os.getenv("SNOWFLAKE_FAKE_DB")
+
 # print("Environment variables loaded.")
 
 # -----------------------------
 #   HELPER: SNOWFLAKE CONNECT
 # -----------------------------
 def get_connection():
+    if FAKE_DB:
+        import fakeSnowflake
+        return fakeSnowflake.connect(FAKE_DB)
+
+    # Imported on first connection so the server answers the MCP handshake immediately
+    import snowflake.connector
+    # Server-side binding with ? placeholders (as SQLite uses): the typed tools send the
+    # same statement text every time, so Snowflake reuses its compiled plan
+    snowflake.connector.paramstyle = "qmark"
     return snowflake.connector.connect(
         account=ACCOUNT,
         user=USER,
         password=PASSWORD,
         warehouse=WAREHOUSE,
         database=DATABASE,
-        schema=SCHEMA
+        schema=SCHEMA,
+        client_session_keep_alive=True   # pooled sessions outlive the default idle expiry
     )
 
+
+# Reuse authenticated sessions across tool calls instead of connecting per query
+pool = ConnectionPool(get_connection, max_size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT)
+query_cache = QueryCache(ttl=CACHE_TTL, orders_ttl=ORDERS_CACHE_TTL)
+
+# -----------------------------
+#   PAGINATED RESULT SETS
+# -----------------------------
+# page_token -> {"conn", "cursor", "columns", "buffer", "returned", "expires", "sql", "customer_id"}
+_open_results = {}
+_open_lock = threading.Lock()
+
+
+def _close_result(state):
+    if state.get("closed"):
+        return
+    state["closed"] = True
+    try:
+        state["cursor"].close()
+    except Exception:
+        pass
+    pool.release(state["conn"])
+
+
+def _sweep_results(make_room=False):
+    """Close expired result sets; with make_room, also the oldest ones over the cap."""
+    now = time.monotonic()
+    with _open_lock:
+        expired = [t for t, st in _open_results.items() if st["expires"] <= now]
+        if make_room:
+            by_age = sorted((st["expires"], t) for t, st in _open_results.items() if t not in expired)
+            expired += [t for _, t in by_age[:max(0, len(by_age) - MAX_OPEN_CURSORS + 1)]]
+        states = [_open_results.pop(t) for t in expired]
+    for state in states:
+        _close_result(state)
+
+
+def _next_page(token, state, page_size):
+    """Fetch one page from an open result set and return the columnar payload."""
+    limit = min(page_size, MAX_ROWS - state["returned"])
+    rows = state["buffer"] + state["cursor"].fetchmany(limit + 1 - len(state["buffer"]))
+    page, state["buffer"] = rows[:limit], rows[limit:]
+    state["returned"] += len(page)
+    more = bool(state["buffer"])
+    truncated = more and state["returned"] >= MAX_ROWS
+
+    if more and not truncated:
+        state["expires"] = time.monotonic() + CURSOR_TTL
+        with _open_lock:
+            _open_results[token] = state
+    else:
+        _close_result(state)
+
+    return {
+        "columns": state["columns"],
+        "rows": [list(r) for r in page],
+        "row_count": len(page),
+        "next_page_token": token if more and not truncated else None,
+        "truncated": truncated,
+    }
+
+
 # -----------------------------
 #   MCP TOOL: RUN SQL QUERY
 # -----------------------------
 @mcp.tool()
-def query_snowflake(sql: str) -> list:
+async def query_snowflake(sql: str, page_token: str = "", page_size: int = PAGE_SIZE, customer_id: str = "") -> dict:
     """
-    Execute SQL in Snowflake and return rows as list of objects.
+    Execute SQL in Snowflake and return one page of results as
+    {"columns": [...], "rows": [[...], ...], "row_count": n, "next_page_token": ..., "truncated": ...}.
+    Each row lists values in the same order as "columns".
+    If "next_page_token" is set and more rows are really needed, call again with the same sql and that page_token.
+    Prefer precise queries (WHERE filters, LIMIT) over paging through large results.
+    Only single SELECT statements on the documented tables and columns are run; order queries are
+    limited to the logged-in customer. A refused query returns {"error", "code", "hint"}: fix it as the hint says and retry.
     Retrieve the required information from internal systems and present the results clearly.
     Do not mention SQL, queries, tables, Snowflake, databases, or any technical execution details.
     Return only the final answer in a customer-friendly manner. and dont ask for further clarification or assistance and end the conversation.
     """
+    # Blocking driver calls run in a worker thread so concurrent calls on one MCP session overlap
+    with span("server:query_snowflake"):
+        return await asyncio.to_thread(_query_snowflake, sql, page_token, page_size, customer_id)
+
 
-    ctx = get_connection()
-    cursor = ctx.cursor()
+def _query_snowflake(sql, page_token, page_size, customer_id):
+    page_size = max(1, min(int(page_size or PAGE_SIZE), PAGE_SIZE))
+    _sweep_results()
 
+    # Validate and rewrite before anything reaches the warehouse (customer_id is set by the agent, not the model)
     try:
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        columns = [c[0] for c in cursor.description]
+        sql = guard_sql(sql, customer_id or None, dialect="sqlite" if FAKE_DB else "snowflake")
+    except SQLGuardError as e:
+        print("Rejected SQL:", e.code, e.message, file=sys.stderr)
+        return e.to_dict()
+
+    if page_token:
+        # A token only continues the query (and customer) that opened it
+        with _open_lock:
+            state = _open_results.get(page_token)
+            if state is not None and state["sql"] == sql and state["customer_id"] == customer_id:
+                del _open_results[page_token]
+            else:
+                state = None
+        if state is None:
+            return {"error": "This page_token has expired, is unknown or belongs to another query; "
+                             "run the query again without it."}
+        try:
+            return _next_page(page_token, state, page_size)
+        except Exception as e:
+            print("Error fetching page:", e, file=sys.stderr)
+            _close_result(state)
+            return {"error": str(e)}
+
+    cached = query_cache.get(sql)
+    count_cache("snowflake", cached is not None)
+    if cached is not None:
+        return cached
 
-        results = [dict(zip(columns, row)) for row in rows]
-        return results
+    _sweep_results(make_room=True)
+    try:
+        ctx = pool.acquire()
     except Exception as e:
-        print("Error executing SQL:", e)
-        return [{"error": str(e)}]
+        print("Error connecting:", e, file=sys.stderr)
+        return {"error": str(e)}
 
-    finally:
+    cursor = None
+    try:
+        cursor = ctx.cursor()
+        if not FAKE_DB:
+            check_cost(cursor, sql)
+        with span("snowflake_execute"):
+            cursor.execute(sql)
+        columns = [c[0] for c in cursor.description]
+    except SQLGuardError as e:
+        print("Rejected SQL:", e.code, e.message, file=sys.stderr)
         cursor.close()
-        ctx.close()
+        pool.release(ctx)
+        return e.to_dict()
+    except Exception as e:
+        print("Error executing SQL:", e, file=sys.stderr)
+        if cursor is not None:
+            cursor.close()
+        pool.release(ctx, broken=not pool.is_healthy(ctx))
+        return {"error": str(e)}
+
+    state = {"conn": ctx, "cursor": cursor, "columns": columns, "buffer": [], "returned": 0,
+             "sql": sql, "customer_id": customer_id}
+    try:
+        result = _next_page(uuid.uuid4().hex, state, page_size)
+    except Exception as e:
+        print("Error fetching rows:", e, file=sys.stderr)
+        _close_result(state)
+        return {"error": str(e)}
+
+    if result["next_page_token"] is None and not result["truncated"]:
+        query_cache.put(sql, result)
+    return result
+
+
+# -----------------------------
+#   TYPED TOOLS (bound parameters)
+# -----------------------------
+# Fixed statements for routine questions; optional filters are bound as '' so
+# each tool always sends the same SQL text and reuses one prepared plan.
+CUSTOMER_ORDERS_SQL = """
+SELECT o.ORDER_ID, o.PRODUCT_ID, p.NAME AS PRODUCT_NAME, o.ORDER_DATE, o.DELIVERY_DATE, o.STATUS,
+       o.PAYMENT_METHOD, o.SHIPPING_ADDRESS, o.TOTAL_AMOUNT
+FROM ORDERS o LEFT JOIN PRODUCTS p ON p.PRODUCT_ID = o.PRODUCT_ID
+WHERE o.CUSTOMER_ID = ? AND (? = '' OR UPPER(o.STATUS) = UPPER(?))
+ORDER BY o.ORDER_DATE DESC
+LIMIT ?
+"""
+
+PRODUCT_SQL = """
+SELECT PRODUCT_ID, NAME, BRAND, CATEGORY, SUB_CATEGORY, DESCRIPTION, SPECIFICATIONS, PRICE, RATING
+FROM PRODUCTS
+WHERE PRODUCT_ID = ?
+"""
+
+SEARCH_PRODUCTS_SQL = """
+SELECT PRODUCT_ID, NAME, BRAND, CATEGORY, PRICE, RATING
+FROM PRODUCTS
+WHERE PRICE <= ?
+  AND (? = '' OR UPPER(CATEGORY) = UPPER(?) OR UPPER(SUB_CATEGORY) = UPPER(?))
+ORDER BY RATING DESC, PRICE
+LIMIT ?
+"""
+
+ORDER_FOR_RETURN_SQL = """
+SELECT o.ORDER_ID, o.PRODUCT_ID, p.NAME AS PRODUCT_NAME, p.CATEGORY, p.SUB_CATEGORY,
+       o.ORDER_DATE, o.DELIVERY_DATE, o.STATUS, o.TOTAL_AMOUNT
+FROM ORDERS o LEFT JOIN PRODUCTS p ON p.PRODUCT_ID = o.PRODUCT_ID
+WHERE o.ORDER_ID = ? AND o.CUSTOMER_ID = ?
+"""
+
+
+def _run_bound(sql, params, cache=True):
+    """Run a fixed statement with bound parameters; returns {"columns", "rows", "row_count"}."""
+    if cache:
+        cached = query_cache.get(sql, params)
+        count_cache("snowflake", cached is not None)
+        if cached is not None:
+            return cached
+    with pool.connection() as ctx:
+        cursor = ctx.cursor()
+        try:
+            with span("snowflake_execute"):
+                cursor.execute(sql, params)
+                columns = [c[0] for c in cursor.description]
+                rows = [list(r) for r in cursor.fetchmany(MAX_ROWS)]
+        finally:
+            cursor.close()
+    result = {"columns": columns, "rows": rows, "row_count": len(rows)}
+    if cache:
+        query_cache.put(sql, result, params)
+    return result
+
+
+def _records(result):
+    return [dict(zip(result["columns"], row)) for row in result["rows"]]
+
+
+def _typed_call(fn, *args):
+    """Run a typed tool body, turning database failures into the usual {"error": ...}."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"Error in {fn.__name__}:", e, file=sys.stderr)
+        return {"error": str(e)}
+
+
+def _as_date(value):
+    """DATE columns come back as dates from Snowflake and as ISO strings from SQLite."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+# Return policy passages come from the same Chroma DB as loadPolicy.py, opened on
+# first use so the server still starts instantly and works without it
+_policy = {"retriever": None, "error": None, "persist_dir": None, "index_version": None}
+_policy_lock = threading.Lock()
+
+
+def _policy_passages(query):
+    with _policy_lock:
+        if _policy["retriever"] is None and _policy["error"] is None:
+            try:
+                from hybrid_retriever import HybridRetriever
+                from ingestPolicy import PERSIST_DIR, open_collection
+                from semantic_cache import index_version
+
+                if not os.path.exists(PERSIST_DIR):
+                    raise FileNotFoundError(f"No policy Chroma DB at {PERSIST_DIR}")
+                _policy["persist_dir"] = PERSIST_DIR
+                _policy["index_version"] = index_version(PERSIST_DIR)
+                _policy["retriever"] = HybridRetriever(open_collection(PERSIST_DIR))
+            except Exception as e:
+                _policy["error"] = f"{type(e).__name__}: {e}"
+                print("Policy lookup unavailable:", _policy["error"], file=sys.stderr)
+        if _policy["retriever"] is None:
+            return None
+        # Same check as loadPolicy.py: after ingestPolicy.py rebuilds the collection,
+        # drop the BM25 index built from the old chunks
+        from semantic_cache import index_version
+
+        version = index_version(_policy["persist_dir"])
+        if version != _policy["index_version"]:
+            _policy["index_version"] = version
+            _policy["retriever"].refresh()
+        retriever = _policy["retriever"]
+    with span("chroma_search"):
+        return retriever.search(query)
+
+
+def _customer_orders(customer_id, status, limit):
+    if not customer_id:
+        return {"error": "No logged-in customer for this request."}
+    limit = max(1, min(int(limit or PAGE_SIZE), PAGE_SIZE))
+    return _run_bound(CUSTOMER_ORDERS_SQL, (customer_id, status, status, limit))
+
+
+def _product(product_id):
+    result = _run_bound(PRODUCT_SQL, (product_id,))
+    if not result["rows"]:
+        return {"error": f"No product with PRODUCT_ID {product_id}."}
+    return _records(result)[0]
+
+
+def _search_products(max_price, category, limit):
+    limit = max(1, min(int(limit or PAGE_SIZE), PAGE_SIZE))
+    return _run_bound(SEARCH_PRODUCTS_SQL, (float(max_price), category, category, category, limit))
+
+
+def _return_eligibility(order_id, customer_id):
+    if not customer_id:
+        return {"error": "No logged-in customer for this request."}
+    # Order status changes, so always read it fresh
+    orders = _records(_run_bound(ORDER_FOR_RETURN_SQL, (order_id, customer_id), cache=False))
+    if not orders:
+        return {"error": f"No order {order_id} found for this customer."}
+    order = orders[0]
+
+    delivered = _as_date(order["DELIVERY_DATE"])
+    facts = {
+        "order": order,
+        "today": datetime.date.today().isoformat(),
+        "delivered": delivered is not None,
+        "days_since_delivery": (datetime.date.today() - delivered).days if delivered else None,
+    }
+    product = " ".join(str(order[k]) for k in ("CATEGORY", "SUB_CATEGORY", "PRODUCT_NAME") if order.get(k))
+    passages = _policy_passages(f"return refund replacement policy window {product}")
+    if passages is None:
+        facts["policy_error"] = "The return policy could not be looked up here; use query_website for it."
+    else:
+        facts["policy"] = passages
+    return facts
+
+
+@mcp.tool()
+async def get_customer_orders(status: str = "", limit: int = 20, customer_id: str = "") -> dict:
+    """
+    The logged-in customer's orders, newest first, with product names, as
+    {"columns": [...], "rows": [[...], ...], "row_count": n}.
+    Optionally filter by status (e.g. "Delivered", "Shipped").
+    Do not mention SQL, queries, tables, Snowflake, databases, or any technical execution details.
+    """
+    with span("server:get_customer_orders"):
+        return await asyncio.to_thread(_typed_call, _customer_orders, customer_id, status, limit)
+
+
+@mcp.tool()
+async def get_product(product_id: str) -> dict:
+    """
+    Details, price and rating of one product by PRODUCT_ID (e.g. "P001").
+    Do not mention SQL, queries, tables, Snowflake, databases, or any technical execution details.
+    """
+    with span("server:get_product"):
+        return await asyncio.to_thread(_typed_call, _product, product_id)
+
+
+@mcp.tool()
+async def search_products(max_price: float, category: str = "", limit: int = 10) -> dict:
+    """
+    Products priced at or below max_price, best rated first, with brand, price and rating, as
+    {"columns": [...], "rows": [[...], ...], "row_count": n}.
+    Optionally restrict to a category or sub-category (e.g. "Appliances", "Lawn Mowers").
+    Do not mention SQL, queries, tables, Snowflake, databases, or any technical execution details.
+    """
+    with span("server:search_products"):
+        return await asyncio.to_thread(_typed_call, _search_products, max_price, category, limit)
+
+
+@mcp.tool()
+async def check_return_eligibility(order_id: str, customer_id: str = "") -> dict:
+    """
+    Everything needed to decide if one of the customer's orders can be returned, refunded or replaced:
+    the order (status, order and delivery dates, product), today's date, days since delivery,
+    and the matching return policy passages.
+    Compare days_since_delivery with the policy window to give the final eligibility.
+    Do not mention SQL, queries, tables, Snowflake, databases, or any technical execution details.
+    """
+    with span("server:check_return_eligibility"):
+        return await asyncio.to_thread(_typed_call, _return_eligibility, order_id, customer_id)
+
+
+# -----------------------------
+#   MCP TOOL: READINESS PROBE
+# -----------------------------
+@mcp.tool()
+def snowflake_status() -> dict:
+    """
+    Internal health check for the service, not for answering customers.
+    Reports connection pool and query cache counters.
+    """
+    return {"ready": True, "pool": pool.stats(), "cache": query_cache.stats()}
 
 if __name__=="__main__":
     mcp.run(transport="stdio")
\ No newline at end of file
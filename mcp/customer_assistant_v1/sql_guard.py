@@ -0,0 +1,291 @@
+import json
+import os
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.scope import traverse_scope
+
+DEFAULT_LIMIT = int(os.getenv("SNOWFLAKE_DEFAULT_LIMIT", "100"))
+MAX_SCAN_BYTES = int(os.getenv("SNOWFLAKE_MAX_SCAN_BYTES", "0"))      # 0 disables the EXPLAIN cost check
+
+# Tables and columns the assistant may read: exactly what sys_prompt.txt documents
+# (CUSTOMERS and INVENTORY only appear there as join keys)
+SCHEMA = {
+    "CUSTOMERS": {"CUSTOMER_ID"},
+    "PRODUCTS": {"PRODUCT_ID", "NAME", "BRAND", "CATEGORY", "SUB_CATEGORY", "DESCRIPTION",
+                 "SPECIFICATIONS", "PRICE", "RATING", "CREATED_AT"},
+    "INVENTORY": {"PRODUCT_ID"},
+    "ORDERS": {"ORDER_ID", "CUSTOMER_ID", "PRODUCT_ID", "ORDER_DATE", "DELIVERY_DATE", "STATUS",
+               "PAYMENT_METHOD", "SHIPPING_ADDRESS", "TOTAL_AMOUNT", "CREATED_AT"},
+}
+# Tables whose rows belong to one customer and must always be filtered to them
+CUSTOMER_SCOPED = {"ORDERS", "CUSTOMERS"}
+# Tables documented only by their join key: SELECT * on them would return undocumented columns
+JOIN_ONLY = {"CUSTOMERS", "INVENTORY"}
+
+_WRITES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+           exp.Command, exp.Copy, exp.TruncateTable)
+
+
+class SQLGuardError(Exception):
+    """A query the guard refused, with enough detail for the agent to fix and retry it."""
+
+    def __init__(self, code, message, hint=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.hint = hint
+
+    def to_dict(self):
+        error = {"error": self.message, "code": self.code}
+        if self.hint:
+            error["hint"] = self.hint
+        return error
+
+
+def _from_tables(select):
+    """Base tables in this SELECT's own FROM/JOIN clauses, as {ALIAS: (alias as written, TABLE)}."""
+    sources = []
+    from_ = select.args.get("from_") or select.args.get("from")
+    if from_ is not None:
+        sources.append(from_.this)
+    sources += [join.this for join in select.args.get("joins") or []]
+    return {src.alias_or_name.upper(): (src.alias_or_name, src.name.upper())
+            for src in sources if isinstance(src, exp.Table)}
+
+
+def _conjuncts(condition):
+    if condition is None:
+        return []
+    if isinstance(condition, exp.And):
+        return _conjuncts(condition.left) + _conjuncts(condition.right)
+    if isinstance(condition, exp.Paren):
+        return _conjuncts(condition.this)
+    return [condition]
+
+
+def _where_conjuncts(select):
+    where = select.args.get("where")
+    return _conjuncts(where.this) if where is not None else []
+
+
+def _check_read_only(statement):
+    if not isinstance(statement, exp.Query) or any(statement.find_all(*_WRITES)):
+        raise SQLGuardError("not_read_only", "Only SELECT queries are allowed.",
+                            "Rewrite the request as a single SELECT statement.")
+
+
+def _check_tables_and_columns(statement):
+    # Table functions (TABLE(RESULT_SCAN(...)), FLATTEN, VALUES) and unknown functions could
+    # read data outside the allowed tables, e.g. another session's earlier result set
+    source = next(statement.find_all(exp.UDTF, exp.Unnest, exp.Anonymous), None)
+    if source is not None:
+        raise SQLGuardError("unsupported_source", f"{source.sql(dialect='snowflake')} is not allowed.",
+                            f"Query the tables directly: {', '.join(sorted(SCHEMA))}.")
+
+    ctes = {cte.alias_or_name.upper() for cte in statement.find_all(exp.CTE)}
+    tables = set()
+    for table in statement.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier) or table.args.get("db") or table.args.get("catalog"):
+            raise SQLGuardError("unknown_table", f"Table {table.sql(dialect='snowflake')} is not available.",
+                                f"Use the plain table names: {', '.join(sorted(SCHEMA))}.")
+        name = table.name.upper()
+        if name in ctes:
+            continue
+        if name not in SCHEMA:
+            raise SQLGuardError("unknown_table", f"Table {name} is not available.",
+                                f"Allowed tables: {', '.join(sorted(SCHEMA))}.")
+        tables.add(name)
+
+    for scope in traverse_scope(statement):
+        select = scope.expression
+        if not isinstance(select, exp.Select):
+            continue
+        # scope.columns leaves out ORDER BY references to this SELECT's own aliases, and
+        # includes columns that correlated subqueries take from this scope
+        columns = [column for column in scope.columns if not column.is_star or column.table]
+        # HAVING / QUALIFY may also name the SELECT's aliases; scope.columns omits their bare columns
+        aliases = {name.upper() for name in select.named_selects}
+        for clause in (select.args.get("having"), select.args.get("qualify")):
+            if clause is not None:
+                columns += [column for column in clause.find_all(exp.Column) if not column.table
+                            and column.find_ancestor(exp.Select) is select and column.name.upper() not in aliases]
+        for column in columns:
+            _check_column(scope, column)
+        for projection in select.expressions:
+            if isinstance(projection, exp.Star):
+                _check_star(source for _, source in scope.selected_sources.values())
+            elif isinstance(projection, exp.Column) and projection.is_star:
+                _check_star([_resolve_source(scope, projection.table.upper())])
+
+
+def _source_columns(source):
+    """Column names a FROM source exposes: a table's documented columns, or a subquery's / CTE's outputs."""
+    if isinstance(source, exp.Table):
+        return SCHEMA.get(source.name.upper(), set())
+    query = source.expression
+    if isinstance(query, exp.SetOperation):
+        # A UNION's columns are named by its first branch
+        query = query.left
+        while isinstance(query, exp.SetOperation):
+            query = query.left
+        return {name.upper() for name in query.named_selects}
+    names = {name.upper() for name in query.named_selects}
+    if any(isinstance(e, exp.Star) or (isinstance(e, exp.Column) and e.is_star) for e in query.expressions):
+        for inner in source.selected_sources.values():
+            names |= _source_columns(inner[1])
+    return names
+
+
+def _resolve_source(scope, qualifier):
+    """The source a qualifier names, looked up in this scope and then the enclosing ones."""
+    while scope is not None:
+        for alias, (_, source) in scope.selected_sources.items():
+            if alias.upper() == qualifier:
+                return source
+        scope = scope.parent
+    return None
+
+
+def _check_star(sources):
+    for source in sources:
+        if isinstance(source, exp.Table) and source.name.upper() in JOIN_ONLY:
+            table = source.name.upper()
+            raise SQLGuardError("unknown_column", f"SELECT * is not allowed on {table}.",
+                                f"Select {table}.{next(iter(SCHEMA[table]))} explicitly.")
+
+
+def _check_column(scope, column):
+    name = column.name.upper()
+    qualifier = column.table.upper()
+    if qualifier:
+        source = _resolve_source(scope, qualifier)
+        if source is None:
+            raise SQLGuardError("unknown_column", f"{column.table} in {column.sql(dialect='snowflake')} "
+                                "is not a table or alias of this query.",
+                                "Qualify columns with a table name or alias from the FROM clause.")
+        if column.is_star or name in _source_columns(source):
+            return
+        if isinstance(source, exp.Table):
+            table = source.name.upper()
+            raise SQLGuardError("unknown_column", f"Column {table}.{name} does not exist.",
+                                f"Columns of {table}: {', '.join(sorted(SCHEMA[table]))}.")
+        raise SQLGuardError("unknown_column", f"Column {column.table}.{name} is not selected by {column.table}.",
+                            "Select the column inside the subquery before using it outside.")
+
+    # An unqualified name comes from this SELECT's sources, or (correlated) from an enclosing one's
+    outer = scope
+    while outer is not None:
+        if any(name in _source_columns(source) for _, source in outer.selected_sources.values()):
+            return
+        outer = outer.parent
+    raise SQLGuardError("unknown_column", f"Column {name} does not exist in the queried tables.",
+                        "Use only the documented columns of the tables in the query.")
+
+
+def _check_joins(select):
+    aliases = _from_tables(select)
+    for join in select.args.get("joins") or []:
+        if join.args.get("on") is not None or join.args.get("using"):
+            continue
+        right = join.this.alias_or_name.upper()
+        name = join.this.alias_or_name
+        # A comma/cross join is fine only when the WHERE clause links it to another table
+        linked = any(
+            isinstance(cond, exp.EQ) and isinstance(cond.left, exp.Column) and isinstance(cond.right, exp.Column)
+            and right in (cond.left.table.upper(), cond.right.table.upper())
+            and cond.left.table.upper() != cond.right.table.upper()
+            for cond in _where_conjuncts(select)
+        )
+        if not linked:
+            other = ", ".join(written for key, (written, _) in aliases.items() if key != right) or "the other table"
+            raise SQLGuardError("cartesian_join", f"Join with {name} has no join condition.",
+                                f"Add an ON clause linking {name} to {other} (e.g. on PRODUCT_ID or CUSTOMER_ID).")
+
+
+def _scope_to_customer(select, customer_id):
+    """Make every customer-scoped table in this SELECT filter on the logged-in customer."""
+    sources = _from_tables(select)
+    single_table = len(sources) == 1
+    for key, (alias, table) in sources.items():
+        if table not in CUSTOMER_SCOPED:
+            continue
+        already = False
+        for cond in _where_conjuncts(select):
+            if not isinstance(cond, exp.EQ):
+                continue
+            column, value = (cond.left, cond.right) if isinstance(cond.left, exp.Column) else (cond.right, cond.left)
+            if not (isinstance(column, exp.Column) and column.name.upper() == "CUSTOMER_ID"):
+                continue
+            if column.table.upper() not in (key, "") or (not column.table and not single_table):
+                continue
+            if not isinstance(value, exp.Literal):
+                continue
+            if customer_id is None or value.this == customer_id:
+                already = True
+            else:
+                raise SQLGuardError("customer_scope", f"{table} can only be looked up for the logged-in customer.",
+                                    f"Filter {table} on CUSTOMER_ID = '{customer_id}'.")
+        if already:
+            continue
+        if customer_id is None:
+            raise SQLGuardError("customer_scope", f"Queries on {table} must filter on a single CUSTOMER_ID.",
+                                "Add WHERE CUSTOMER_ID = '<customer id>'.")
+        column = exp.column("CUSTOMER_ID", table=alias if key != table or not single_table else None)
+        select.where(exp.EQ(this=column, expression=exp.Literal.string(customer_id)), copy=False)
+
+
+def _apply_limit(statement, default_limit):
+    """Keep a LIMIT / FETCH FIRST only when it is a plain row count within `default_limit`."""
+    limit = statement.args.get("limit")
+    if isinstance(limit, exp.Fetch):
+        options = limit.args.get("limit_options")
+        if options is not None and (options.args.get("percent") or options.args.get("with_ties")):
+            limit = None
+        else:
+            value = limit.args.get("count") or exp.Literal.number(1)    # FETCH FIRST ROW ONLY
+    elif limit is not None:
+        value = limit.expression
+    if limit is None or not (isinstance(value, exp.Literal) and value.is_int and int(value.this) <= default_limit):
+        # Replaces the existing clause (a FETCH, 1e9, an expression, ...) with a plain LIMIT
+        statement.limit(default_limit, copy=False)
+
+
+def guard_sql(sql, customer_id=None, default_limit=DEFAULT_LIMIT, dialect="snowflake"):
+    """
+    Validate LLM-written SQL and return the statement to run, rendered for `dialect`.
+
+    The query must be a single read-only SELECT over the allowed tables and
+    columns, with no join lacking a join condition. ORDERS and CUSTOMERS are
+    filtered to `customer_id` (added when missing, rejected when it names someone else),
+    and the outer query gets a LIMIT of at most `default_limit`.
+    Raises SQLGuardError describing what to change.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(sql, read="snowflake") if s is not None]
+    except sqlglot.errors.ParseError as e:
+        raise SQLGuardError("parse_error", "The SQL could not be parsed.", str(e).splitlines()[0]) from None
+    if len(statements) != 1:
+        raise SQLGuardError("multiple_statements", "Send exactly one SQL statement per call.")
+
+    statement = statements[0]
+    _check_read_only(statement)
+    _check_tables_and_columns(statement)
+    for select in statement.find_all(exp.Select):
+        _check_joins(select)
+        _scope_to_customer(select, customer_id)
+    _apply_limit(statement, default_limit)
+    return statement.sql(dialect=dialect)
+
+
+def check_cost(cursor, sql, max_bytes=MAX_SCAN_BYTES):
+    """Snowflake only: refuse a query whose EXPLAIN plan would scan more than `max_bytes`."""
+    if not max_bytes:
+        return
+    cursor.execute(f"EXPLAIN USING JSON {sql}")
+    plan = json.loads(cursor.fetchone()[0])
+    scanned = plan.get("GlobalStats", {}).get("bytesAssigned", 0)
+    if scanned > max_bytes:
+        raise SQLGuardError("too_expensive",
+                            f"This query would scan about {scanned // 2 ** 20} MB, over the {max_bytes // 2 ** 20} MB limit.",
+                            "Add selective WHERE filters (e.g. on ORDER_ID, PRODUCT_ID or a date range).")
@@ -0,0 +1,143 @@
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# Imported by the entry points before they load .env themselves
+load_dotenv()
+
+# Spans: a sampled share of traces goes to a local exporter (never stdout, which
+# the MCP servers use for the protocol). Metrics are always recorded.
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "off")                           # off | stderr | <path to .jsonl>
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.05"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))            # share of verbose debug lines printed
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME") or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "chat"
+
+# Stage latency buckets (seconds): cache hits and BM25 at the low end, LLM turns at the top
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# -----------------------------
+#   TRACING (optional OpenTelemetry SDK)
+# -----------------------------
+def _setup_tracer():
+    if TRACE_EXPORT == "off":
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        print("[WARN] TRACE_EXPORT is set but opentelemetry-sdk is not installed.", file=sys.stderr)
+        return None
+
+    out = sys.stderr if TRACE_EXPORT == "stderr" else open(TRACE_EXPORT, "a", encoding="utf-8")
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO))
+    )
+    # Batched: spans are written from a background thread, off the request path
+    provider.add_span_processor(BatchSpanProcessor(
+        ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    ))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer(SERVICE_NAME)
+
+
+# -----------------------------
+#   METRICS (optional prometheus_client)
+# -----------------------------
+class _Metrics:
+    def __init__(self):
+        from prometheus_client import Counter, Histogram
+
+        self.stage_seconds = Histogram(
+            "chat_stage_seconds", "Latency of each stage of a chat turn", ["stage"], buckets=LATENCY_BUCKETS
+        )
+        self.stage_errors = Counter("chat_stage_errors_total", "Stages that raised", ["stage"])
+        self.tokens = Counter("chat_llm_tokens_total", "LLM tokens", ["kind"])
+        self.cache = Counter("chat_cache_lookups_total", "Cache lookups", ["cache", "result"])
+        self.intents = Counter("chat_intents_total", "Messages per routed intent", ["intent"])
+
+
+def _setup_metrics():
+    try:
+        return _Metrics()
+    except ImportError:
+        return None
+
+
+_tracer = _setup_tracer()
+_metrics = _setup_metrics()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time one stage of a request: always into the chat_stage_seconds histogram,
+    and as an OpenTelemetry span when tracing is on and the trace is sampled.
+    """
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield None
+        else:
+            with _tracer.start_as_current_span(stage, attributes=attributes) as current:
+                yield current
+    except BaseException:
+        if _metrics is not None:
+            _metrics.stage_errors.labels(stage).inc()
+        raise
+    finally:
+        if _metrics is not None:
+            _metrics.stage_seconds.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe(stage, seconds):
+    """Record a stage duration measured elsewhere (e.g. a span that could not wrap the code)."""
+    if _metrics is not None:
+        _metrics.stage_seconds.labels(stage).observe(seconds)
+
+
+def count_tokens(input_tokens=0, output_tokens=0, cached_tokens=0):
+    if _metrics is not None:
+        _metrics.tokens.labels("input").inc(input_tokens)
+        _metrics.tokens.labels("output").inc(output_tokens)
+        _metrics.tokens.labels("cached").inc(cached_tokens)
+
+
+def count_cache(cache, hit):
+    if _metrics is not None:
+        _metrics.cache.labels(cache, "hit" if hit else "miss").inc()
+
+
+def count_intent(intent):
+    if _metrics is not None:
+        _metrics.intents.labels(intent or "general").inc()
+
+
+def sampled(rate=LOG_SAMPLE_RATE):
+    """True for roughly `rate` of calls; guards verbose logging so it stays off the hot path."""
+    return rate > 0 and random.random() < rate
+
+
+def render_metrics():
+    """(body, content type) for a Prometheus scrape of this process (or all workers in multiprocess mode)."""
+    if _metrics is None:
+        return b"# prometheus_client is not installed\n", "text/plain; charset=utf-8"
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    # With PROMETHEUS_MULTIPROC_DIR set, every process (uvicorn workers, MCP servers)
+    # writes its samples there and one scrape aggregates them
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
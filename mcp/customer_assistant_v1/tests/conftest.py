@@ -0,0 +1,8 @@
+"""
+tests/conftest.py
+Puts the project directory on sys.path so the tests import its modules under a bare `pytest`.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
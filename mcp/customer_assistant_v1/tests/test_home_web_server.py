@@ -0,0 +1,127 @@
+"""
+tests/test_home_web_server.py
+Incremental website crawl (update_index) against a local HTTP server.
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("langchain_community")
+
+import homeWebServer
+
+
+class Site:
+    """Pages served by the fixture server: path -> (etag, body), plus every request's If-None-Match."""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+
+    def page(self, path, etag, text):
+        self.pages[path] = (etag, f"<html><body><nav>menu</nav><p>{text}</p></body></html>")
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site.requests.append((self.path, self.headers.get("If-None-Match")))
+            etag, body = site.pages[self.path]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class FakeVectorDB:
+    """Records what update_index embeds and deletes."""
+
+    def __init__(self):
+        self.added = []
+        self.deleted = []
+
+    def add_texts(self, texts, metadatas, ids):
+        self.added.extend(zip(ids, texts))
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+
+
+@pytest.fixture
+def site():
+    site = Site()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(site))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(site, paths, state):
+    db = FakeVectorDB()
+    site.requests.clear()
+    stats = asyncio.run(homeWebServer.update_index(db, [site.url + p for p in paths], state))
+    return db, stats
+
+
+@pytest.fixture
+def crawled(site):
+    """Two pages indexed once, as a previous run would have left them."""
+    site.page("/returns", '"r1"', "Most items can be returned within 90 days.")
+    site.page("/rental", '"t1"', "Tools can be rented by the day or week.")
+    state = {}
+    db, stats = crawl(site, ["/returns", "/rental"], state)
+    assert stats["changed"] == 2 and len(db.added) == 2
+    return state
+
+
+def test_not_modified_page_is_skipped(site, crawled):
+    db, stats = crawl(site, ["/returns", "/rental"], crawled)
+    assert ("/returns", '"r1"') in site.requests
+    assert stats["unchanged"] == 2
+    assert db.added == [] and db.deleted == []
+
+
+def test_same_content_new_etag_is_not_reembedded(site, crawled):
+    site.page("/returns", '"r2"', "Most items can be returned within 90 days.")
+    db, stats = crawl(site, ["/returns", "/rental"], crawled)
+    assert stats["unchanged"] == 2
+    assert db.added == [] and db.deleted == []
+    assert crawled[site.url + "/returns"]["etag"] == '"r2"'
+
+
+def test_changed_page_is_reembedded(site, crawled):
+    old_ids = crawled[site.url + "/rental"]["chunk_ids"]
+    site.page("/rental", '"t2"', "Tools can be rented for four hours, a day or a week.")
+    db, stats = crawl(site, ["/returns", "/rental"], crawled)
+    assert stats["changed"] == 1 and stats["unchanged"] == 1
+    assert [text for _, text in db.added] == ["Tools can be rented for four hours, a day or a week."]
+    assert db.deleted == old_ids
+    assert crawled[site.url + "/rental"]["chunk_ids"] == [cid for cid, _ in db.added]
+
+
+def test_removed_url_loses_its_chunks(site, crawled):
+    old_ids = crawled[site.url + "/rental"]["chunk_ids"]
+    db, stats = crawl(site, ["/returns"], crawled)
+    assert stats["removed"] == 1
+    assert db.deleted == old_ids
+    assert site.url + "/rental" not in crawled
+    assert [path for path, _ in site.requests] == ["/returns"]
@@ -0,0 +1,44 @@
+"""
+tests/test_query_pages.py
+query_snowflake paging against the fakeSnowflake demo database.
+"""
+import pytest
+
+import fakeSnowflake
+import snowflakeServer
+
+SQL = "SELECT ORDER_ID FROM ORDERS ORDER BY ORDER_ID"
+
+
+@pytest.fixture(autouse=True)
+def demo_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "demo.sqlite")
+    fakeSnowflake.create_demo_db(path)
+    monkeypatch.setattr(snowflakeServer, "FAKE_DB", path)
+    snowflakeServer.query_cache.clear()
+    yield
+    snowflakeServer.pool.close_all()
+
+
+def first_page():
+    page = snowflakeServer._query_snowflake(SQL, "", 1, "C001")
+    assert page["rows"] == [["O001"]] and page["next_page_token"]
+    return page["next_page_token"]
+
+
+def test_token_continues_its_query():
+    token = first_page()
+    page = snowflakeServer._query_snowflake(SQL, token, 1, "C001")
+    assert page["rows"] == [["O002"]]
+    assert page["next_page_token"] is None
+
+
+@pytest.mark.parametrize("sql, customer_id", [
+    (SQL, "C002"),
+    ("SELECT NAME FROM PRODUCTS", "C001"),
+])
+def test_token_refused_for_other_query_or_customer(sql, customer_id):
+    token = first_page()
+    assert "error" in snowflakeServer._query_snowflake(sql, token, 1, customer_id)
+    # The owner can still continue
+    assert snowflakeServer._query_snowflake(SQL, token, 1, "C001")["rows"] == [["O002"]]
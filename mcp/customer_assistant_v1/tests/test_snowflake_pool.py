@@ -0,0 +1,136 @@
+"""
+tests/test_snowflake_pool.py
+ConnectionPool and QueryCache from snowflakePool.py, using the fakeSnowflake SQLite connector.
+"""
+import pytest
+
+import fakeSnowflake
+import snowflakePool
+from snowflakePool import ConnectionPool, QueryCache, normalize_sql
+
+
+class Clock:
+    """Stands in for time.monotonic so TTLs and idle timeouts can be stepped through."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(snowflakePool.time, "monotonic", clock.monotonic)
+    return clock
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "demo.sqlite")
+    fakeSnowflake.create_demo_db(path)
+    pool = ConnectionPool(lambda: fakeSnowflake.connect(path), max_size=2, idle_timeout=300, health_check_after=30)
+    yield pool
+    pool.close_all()
+
+
+def test_released_connection_is_reused(pool):
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats() == {"idle": 0, "in_use": 1, "created": 1, "reused": 1}
+
+
+def test_max_size_blocks_until_release(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(first)
+    assert pool.acquire(timeout=0.05) is first
+    pool.release(second)
+
+
+def test_idle_connections_are_evicted(pool, clock):
+    conn = pool.acquire()
+    pool.release(conn)
+    clock.now += 301
+    assert pool.acquire() is not conn
+    assert pool.stats()["created"] == 2
+
+
+def test_broken_connection_is_replaced(pool):
+    conn = pool.acquire()
+    pool.release(conn, broken=True)
+    assert pool.acquire() is not conn
+    assert pool.stats()["created"] == 2
+
+
+def test_stale_connection_fails_health_check(pool, clock):
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()                  # e.g. the server dropped the session while it sat idle
+    clock.now += 31
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute("SELECT COUNT(*) FROM PRODUCTS").fetchone() == (4,)
+
+
+def test_failed_statement_keeps_healthy_connection(pool):
+    with pytest.raises(Exception):
+        with pool.connection() as conn:
+            conn.execute("SELECT * FROM MISSING_TABLE")
+    assert pool.stats()["idle"] == 1
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("select  *\n from orders where status = 'Shipped';") == \
+        normalize_sql("SELECT * FROM ORDERS WHERE STATUS = 'Shipped'")
+    assert normalize_sql("SELECT * FROM ORDERS WHERE STATUS = 'shipped'") != \
+        normalize_sql("SELECT * FROM ORDERS WHERE STATUS = 'Shipped'")
+
+
+def test_cache_hit_until_ttl(clock):
+    cache = QueryCache(ttl=300, orders_ttl=60)
+    cache.put("SELECT * FROM PRODUCTS", [("P001",)])
+    assert cache.get("select *  from products") == [("P001",)]
+    clock.now += 301
+    assert cache.get("SELECT * FROM PRODUCTS") is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1}
+
+
+def test_orders_use_shorter_ttl(clock):
+    cache = QueryCache(ttl=300, orders_ttl=60)
+    sql = "SELECT * FROM ORDERS WHERE CUSTOMER_ID = 'C001'"
+    cache.put(sql, [("O001",)])
+    clock.now += 59
+    assert cache.get(sql) == [("O001",)]
+    clock.now += 2
+    assert cache.get(sql) is None
+
+
+def test_orders_scoped_to_one_customer():
+    cache = QueryCache()
+    cache.put("SELECT * FROM ORDERS", [("O001",), ("O003",)])
+    cache.put("SELECT * FROM ORDERS WHERE CUSTOMER_ID = 'C001' OR CUSTOMER_ID = 'C002'", [("O003",)])
+    assert cache.stats()["entries"] == 0
+    cache.put("SELECT * FROM ORDERS WHERE CUSTOMER_ID = ?", [("O001",)], params=("C001",))
+    assert cache.get("SELECT * FROM ORDERS WHERE CUSTOMER_ID = ?", params=("C002",)) is None
+    assert cache.get("SELECT * FROM ORDERS WHERE CUSTOMER_ID = ?", params=("C001",)) == [("O001",)]
+
+
+def test_writes_not_cached():
+    cache = QueryCache()
+    cache.put("DELETE FROM PRODUCTS", [])
+    assert cache.get("DELETE FROM PRODUCTS") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_max_entries_drops_oldest():
+    cache = QueryCache(max_entries=2)
+    for pid in ("P001", "P002", "P003"):
+        cache.put(f"SELECT * FROM PRODUCTS WHERE PRODUCT_ID = '{pid}'", [(pid,)])
+    assert cache.get("SELECT * FROM PRODUCTS WHERE PRODUCT_ID = 'P001'") is None
+    assert cache.get("SELECT * FROM PRODUCTS WHERE PRODUCT_ID = 'P003'") == [("P003",)]
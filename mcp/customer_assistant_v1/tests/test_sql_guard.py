@@ -0,0 +1,153 @@
+"""
+tests/test_sql_guard.py
+What sql_guard lets through to Snowflake, run against the fakeSnowflake demo database.
+"""
+import pytest
+
+import fakeSnowflake
+from sql_guard import SQLGuardError, guard_sql
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "demo.sqlite")
+    fakeSnowflake.create_demo_db(path)
+    conn = fakeSnowflake.connect(path)
+    yield conn
+    conn.close()
+
+
+def run(db, sql, customer_id="C001", **kwargs):
+    return db.execute(guard_sql(sql, customer_id, dialect="sqlite", **kwargs)).fetchall()
+
+
+def refused(sql, customer_id="C001"):
+    with pytest.raises(SQLGuardError) as e:
+        guard_sql(sql, customer_id)
+    return e.value.code
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM ORDERS WHERE CUSTOMER_ID = 'C001'",
+    "UPDATE PRODUCTS SET PRICE = 0",
+    "INSERT INTO CUSTOMERS VALUES ('C9', 'x', 'x', 'x', 'x')",
+    "DROP TABLE ORDERS",
+    "CREATE TABLE T AS SELECT * FROM PRODUCTS",
+])
+def test_writes_refused(sql):
+    assert refused(sql) == "not_read_only"
+
+
+def test_multiple_statements_refused():
+    assert refused("SELECT * FROM PRODUCTS; DELETE FROM PRODUCTS") == "multiple_statements"
+
+
+def test_unknown_table_and_column():
+    assert refused("SELECT * FROM PAYMENTS") == "unknown_table"
+    assert refused("SELECT COLOR FROM PRODUCTS") == "unknown_column"
+    assert refused("SELECT p.COLOR FROM PRODUCTS p") == "unknown_column"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM PRODUCTS p WHERE EXISTS "
+    "(SELECT 1 FROM ORDERS o WHERE o.PRODUCT_ID = p.PRODUCT_ID AND p.COST > 1)",
+    "SELECT 1 AS COST, COST FROM PRODUCTS",
+    "SELECT NAME AS N FROM PRODUCTS WHERE N = 'x'",
+    "SELECT t.PRICE FROM (SELECT NAME FROM PRODUCTS) t",
+    "SELECT x.NAME FROM PRODUCTS p",
+])
+def test_columns_resolved_through_scopes(sql):
+    assert refused(sql) == "unknown_column"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT NAME AS N FROM PRODUCTS ORDER BY N",
+    "SELECT CATEGORY, COUNT(*) AS C FROM PRODUCTS GROUP BY CATEGORY HAVING C > 0",
+    "SELECT t.N FROM (SELECT NAME AS N FROM PRODUCTS) t WHERE N <> ''",
+    "SELECT NAME FROM PRODUCTS p WHERE EXISTS (SELECT 1 FROM ORDERS o WHERE o.PRODUCT_ID = p.PRODUCT_ID)",
+])
+def test_visible_aliases_allowed(db, sql):
+    assert run(db, sql)
+
+
+def test_only_documented_customer_columns(db):
+    assert refused("SELECT EMAIL, NAME FROM CUSTOMERS") == "unknown_column"
+    assert refused("SELECT * FROM CUSTOMERS") == "unknown_column"
+    assert run(db, "SELECT CUSTOMER_ID FROM CUSTOMERS") == [("C001",)]
+
+
+def test_cartesian_join_refused(db):
+    assert refused("SELECT * FROM PRODUCTS, ORDERS") == "cartesian_join"
+    rows = run(db, "SELECT p.NAME, o.ORDER_ID FROM PRODUCTS p, ORDERS o "
+                   "WHERE p.PRODUCT_ID = o.PRODUCT_ID ORDER BY o.ORDER_ID")
+    assert [row[1] for row in rows] == ["O001", "O002"]
+
+
+def test_orders_filter_added(db):
+    rows = run(db, "SELECT ORDER_ID FROM ORDERS ORDER BY ORDER_ID")
+    assert rows == [("O001",), ("O002",)]
+
+
+def test_orders_for_other_customer_refused():
+    assert refused("SELECT * FROM ORDERS WHERE CUSTOMER_ID = 'C002'") == "customer_scope"
+
+
+def test_orders_need_filter_without_customer():
+    assert refused("SELECT * FROM ORDERS", customer_id=None) == "customer_scope"
+
+
+def test_or_cannot_bypass_scope(db):
+    rows = run(db, "SELECT ORDER_ID FROM ORDERS WHERE STATUS = 'Delivered' OR 1 = 1 ORDER BY ORDER_ID")
+    assert rows == [("O001",), ("O002",)]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM (SELECT ORDER_ID, CUSTOMER_ID FROM ORDERS) t",
+    "WITH o AS (SELECT ORDER_ID, CUSTOMER_ID FROM ORDERS) SELECT * FROM o",
+    "SELECT NAME FROM PRODUCTS WHERE PRODUCT_ID IN (SELECT PRODUCT_ID FROM ORDERS)",
+    "SELECT ORDER_ID FROM ORDERS WHERE STATUS = 'Shipped' UNION SELECT ORDER_ID FROM ORDERS",
+])
+def test_nested_orders_scoped(db, sql):
+    rows = run(db, sql)
+    assert rows
+    assert "O003" not in {value for row in rows for value in row}
+    assert "Refrigerator" not in " ".join(str(value) for row in rows for value in row)
+
+
+def test_limit_added_and_clamped(db):
+    assert guard_sql("SELECT * FROM PRODUCTS", default_limit=2).endswith("LIMIT 2")
+    assert len(run(db, "SELECT * FROM PRODUCTS LIMIT 1000", default_limit=2)) == 2
+    assert len(run(db, "SELECT * FROM PRODUCTS LIMIT 1", default_limit=2)) == 1
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM PRODUCTS LIMIT 1e9",
+    "SELECT * FROM PRODUCTS LIMIT (SELECT 1000)",
+    "SELECT * FROM PRODUCTS FETCH FIRST 100000 ROWS ONLY",
+    "SELECT * FROM PRODUCTS FETCH FIRST 50 PERCENT ROWS ONLY",
+])
+def test_untrusted_limits_replaced(sql):
+    assert guard_sql(sql, default_limit=2).endswith("LIMIT 2")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM TABLE(RESULT_SCAN(LAST_QUERY_ID()))",
+    "SELECT * FROM TABLE(FLATTEN(INPUT => PARSE_JSON('[1]')))",
+    "SELECT * FROM (VALUES (1)) v",
+])
+def test_table_functions_refused(sql):
+    assert refused(sql) == "unsupported_source"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM PROD_DB.PUBLIC.ORDERS",
+    "SELECT * FROM PUBLIC.PRODUCTS",
+    "SELECT * FROM IDENTIFIER('ORDERS')",
+])
+def test_qualified_tables_refused(sql):
+    assert refused(sql) == "unknown_table"
+
+
+def test_qualified_star_allowed(db):
+    rows = run(db, "SELECT o.* FROM ORDERS o JOIN CUSTOMERS c ON o.CUSTOMER_ID = c.CUSTOMER_ID")
+    assert sorted(row[0] for row in rows) == ["O001", "O002"]